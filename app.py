@@ -1,17 +1,129 @@
 # app.py
 
 import os
+import time
+import hashlib
+_START = time.perf_counter()
+
 import streamlit as st
 import plotly.express as px
 
 # ==== Import Modules ====
-from modules.expense_analyzer import load_transactions, categorize_expenses, get_summary
-from modules.trend_forecaster import forecast_expense
+# Only light modules are imported up front. Pinecone, Groq, the embedding
+# model and the PDF stack are all created lazily on first use, so the
+# Expense Analyzer tab never waits on the network or PyTorch.
+from modules.expense_analyzer import load_transactions, iter_transactions, categorize_expenses, TransactionSummary
+from modules.expense_cube import get_expense_cube, cube_available
+from modules.trend_forecaster import forecast_monthly_totals
 from modules.chatbot import ask_finance_bot
 from modules.pdf_qa_bot import ask_pdf_question
+from modules.document_registry import SupersededDocumentError
 from dotenv import load_dotenv
 load_dotenv()
 
+# Cold-start budget (seconds) for a full script run that touches no heavy client
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "1.0"))
+
+# CSV uploads above this size are summarised in chunks instead of loaded whole
+CSV_IN_MEMORY_MB = float(os.getenv("CSV_IN_MEMORY_MB", "100"))
+# Analysed uploads kept in memory across reruns and sessions
+CSV_CACHE_ENTRIES = int(os.getenv("CSV_CACHE_ENTRIES", "4"))
+# Rows sent to the browser per page of a transaction table
+TABLE_PAGE_ROWS = int(os.getenv("TABLE_PAGE_ROWS", "1000"))
+
+
+# ==== Rerun Caching ====
+# Streamlit reruns this whole script on every widget interaction. Everything
+# that depends only on an upload's content is keyed on a hash of its bytes,
+# so a rerun reuses the parsed, categorised and summarised result (and the
+# figures) instead of redoing the work.
+def upload_key(file):
+    # Identifies one upload: the same file uploaded again gets a new key
+    return getattr(file, "file_id", None) or (file.name, file.size)
+
+
+def upload_digest(file) -> str:
+    # MD5 of the upload, as get_file_hash computes for a saved file; hashed
+    # once per uploaded file, not on every rerun
+    if "upload_digests" not in st.session_state:
+        st.session_state.upload_digests = {}
+    key = upload_key(file)
+    if key not in st.session_state.upload_digests:
+        st.session_state.upload_digests[key] = hashlib.md5(file.getbuffer()).hexdigest()
+    return st.session_state.upload_digests[key]
+
+
+@st.cache_resource(show_spinner=False, max_entries=CSV_CACHE_ENTRIES)
+def analyze_transactions(digest: str, _file):
+    # Shared, not copied, between reruns: callers must not modify the frames
+    _file.seek(0)
+    transactions = TransactionSummary()
+
+    if _file.size > CSV_IN_MEMORY_MB * 1024 * 1024:
+        # Large export: aggregate chunk by chunk, never holding the whole file
+        for _ in transactions.track(categorize_expenses(c) for c in iter_transactions(_file)):
+            pass
+        table = transactions.preview
+    else:
+        table = categorize_expenses(load_transactions(_file))
+        transactions.add(table)
+
+    return {"table": table, "transactions": transactions}
+
+
+def merge_into_history(digest: str, file, analysis):
+    # Merges an upload into the history cube once per session and cube
+    # generation, outside the shared cache: a cache hit must not skip (or
+    # repeat) the side effect. Returns this session's (added, skipped) for the
+    # upload, or None for an upload attached when the history was cleared.
+    if "merged_uploads" not in st.session_state:
+        st.session_state.merged_uploads = {}
+    if upload_key(file) in st.session_state.get("cleared_uploads", ()):
+        return None
+
+    cube = get_expense_cube()
+    generation, result = st.session_state.merged_uploads.get(digest, (None, None))
+    if generation != cube.generation:
+        # Not merged yet, or merged into history that has since been cleared
+        generation = cube.generation
+        if file.size > CSV_IN_MEMORY_MB * 1024 * 1024:
+            # Only a preview was kept, so the chunks are read a second time
+            file.seek(0)
+            result = cube.append(categorize_expenses(c) for c in iter_transactions(file))
+        else:
+            result = cube.append([analysis["table"]])
+        st.session_state.merged_uploads[digest] = (generation, result)
+    return result
+
+
+@st.cache_data(show_spinner=False)
+def category_figures(summary):
+    bar = px.bar(summary, x=summary.index, y='Amount', title="Spending by Category")
+    pie = px.pie(summary.reset_index(), names='Category', values='Amount', title="Spending Distribution")
+    return bar, pie
+
+
+@st.cache_data(show_spinner=False)
+def forecast_view(monthly, model):
+    forecast_df, error = forecast_monthly_totals(monthly, model=model)
+    if error:
+        return None, error, None
+    return forecast_df, None, px.line(forecast_df, x='Month', y='Predicted_Expense', title='Forecasted Expenses')
+
+
+def show_table(df, total_rows=None, key="table"):
+    # Only one page of rows goes to the browser per rerun
+    total_rows = len(df) if total_rows is None else total_rows
+    pages = max(1, -(-len(df) // TABLE_PAGE_ROWS))
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    start = (page - 1) * TABLE_PAGE_ROWS
+    shown = df.iloc[start:start + TABLE_PAGE_ROWS]
+    if len(shown) < total_rows:
+        st.caption(f"Showing rows {start + 1:,}–{start + len(shown):,} of {total_rows:,} transactions.")
+    st.dataframe(shown)
+
 
 # ==== Page Setup ====
 st.set_page_config(page_title="FinGenAI", page_icon="📊", layout="wide")
@@ -137,8 +249,6 @@ with tabs[0]:
 
  
 # pdf q/a bot
-from modules.pdf_processor import process_pdf, get_file_hash  # or use compute_file_hash
-from modules.pinecone_handler import vectors_exist_in_pinecone, upload_embeddings_to_pinecone
 
 
 uploaded_files = st.file_uploader("📤 Upload Financial PDFs", type=["pdf"], accept_multiple_files=True)
@@ -153,62 +263,88 @@ if "file_hashes" not in st.session_state:
 if "file_paths" not in st.session_state:
     st.session_state.file_paths = {}
 
-if "all_chunks" not in st.session_state:
-    st.session_state.all_chunks = []
+if "chunk_counts" not in st.session_state:
+    st.session_state.chunk_counts = {}
 
 if uploaded_files:
+    # Imported on first upload: pulls in pdfplumber/PyMuPDF and the vector store
+    from modules.ingestion import ingest_pdf, ensure_lexical_index
+    from modules.chunk_cache import cached_chunk_count
+    from modules.pinecone_handler import vectors_exist_in_pinecone
+    from modules.document_registry import get_document_registry
+
     os.makedirs("temp", exist_ok=True)
 
     for file in uploaded_files:
-        # Save uploaded file locally
-        file_path = os.path.join("temp", file.name)
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
-
-        file_hash = get_file_hash(file_path)
+        # Hashed from the upload itself, so reruns don't rewrite every PDF
+        file_hash = upload_digest(file)
 
         # Check if this file hash was already processed in this session
         if file_hash in st.session_state.file_hashes:
             st.info(f"🔁 {file.name} already processed in this session.")
             continue
 
-        with st.spinner(f"📄 Processing {file.name}..."):
-            # Process the PDF
-            chunks = process_pdf(file_path)
-            chunks = [c for c in chunks if c.get("text") or c.get("table_text")]
-
-            if not chunks:
-                st.warning(f"⚠️ No content found in {file.name}. Skipping.")
-                continue
+        # Save uploaded file locally
+        file_path = os.path.join("temp", file.name)
+        with open(file_path, "wb") as f:
+            f.write(file.getbuffer())
 
-            # Check Pinecone only if embeddings not already uploaded
+        with st.spinner(f"📄 Processing {file.name}..."):
+            # Check the vector store (Pinecone or local, per VECTOR_STORE) before extracting
             if not vectors_exist_in_pinecone(file_hash):
-                upload_embeddings_to_pinecone(file_hash, chunks)
-                st.success(f"📥 Uploaded {len(chunks)} chunks from {file.name}.")
+                # Stream extract -> embed -> upsert without holding the document in memory
+                try:
+                    chunk_count = ingest_pdf(file_path, file_hash)
+                except Exception as e:
+                    # The upload stays unfinished; uploading the file again resumes it
+                    st.error(f"❌ Failed to index {file.name}: {e}")
+                    continue
+
+                # Some batches failed: the upsert manifest is incomplete and the
+                # hash stays out of the session so the next upload resumes it
+                if not vectors_exist_in_pinecone(file_hash):
+                    st.error(f"❌ Only part of {file.name} was indexed. Upload it again to resume.")
+                    continue
+
+                if not chunk_count:
+                    st.warning(f"⚠️ No content found in {file.name}. Skipping.")
+                    continue
+
+                st.success(f"📥 Uploaded {chunk_count} chunks from {file.name}.")
             else:
+                ensure_lexical_index(file_path, file_hash)
+                chunk_count = cached_chunk_count(file_hash)
                 st.info(f"✅ Embeddings already exist for {file.name}.")
 
-            # Save session state
+            # Save session state; an earlier version of the same file is no longer indexed
+            registry = get_document_registry()
+            st.session_state.file_hashes = [h for h in st.session_state.file_hashes if not registry.is_superseded(h)]
             st.session_state.file_hashes.append(file_hash)
             st.session_state.file_paths[file_hash] = file_path
-            st.session_state.all_chunks.extend(chunks)
+            st.session_state.chunk_counts[file_hash] = chunk_count
 
         
 
     st.success("✅ All PDFs processed and indexed.")
 
 # UI for asking questions
-if st.session_state.all_chunks:
+if st.session_state.file_hashes:
     st.subheader("💬 Ask a Question")
     query = st.text_input("Type your financial question here...")
 
     if st.button("Get Answer") and query.strip():
-        with st.spinner("🔍 Fetching answer..."):
-            # Assume last uploaded PDF is used for now
-            last_file_hash = st.session_state.file_hashes[-1]
-            answer = ask_pdf_question(query, last_file_hash)
+        try:
+            with st.spinner("🔍 Fetching answer..."):
+                # Search every uploaded PDF and answer from the best chunks overall
+                answer_stream = ask_pdf_question(query, st.session_state.file_hashes, stream=True)
+        except SupersededDocumentError as e:
+            # Another upload replaced one of these documents since it was added here
+            st.session_state.file_hashes = [h for h in st.session_state.file_hashes if h not in e.file_hashes]
+            st.error(f"❌ {e}")
+        else:
             st.markdown("### 📌 Answer")
-            st.success(answer)
+            # Render tokens as Groq produces them
+            st.write_stream(answer_stream)
 
 
 
@@ -217,34 +353,59 @@ with tabs[1]:
     st.header("📊 Expense Analyzer (CSV Upload)")
 
     uploaded_csv = st.file_uploader("📤 Upload your transaction CSV", type=["csv"])
+    cube = get_expense_cube() if cube_available() else None
 
     if uploaded_csv is not None:
-        df = load_transactions(uploaded_csv)
-        df = categorize_expenses(df)
+        # Each upload is merged once into the persistent history cube;
+        # summaries and forecasts then read from the cube, not the raw rows
+        digest = upload_digest(uploaded_csv)
+        with st.spinner("📊 Analysing transactions..."):
+            analysis = analyze_transactions(digest, uploaded_csv)
+            merged = merge_into_history(digest, uploaded_csv, analysis) if cube is not None else None
+        transactions = analysis["transactions"]
 
         st.subheader("📋 Transaction Table")
-        st.dataframe(df)
+        # Large exports only keep a preview of their first rows
+        show_table(analysis["table"], total_rows=transactions.rows, key="transactions")
+
+        if merged is not None:
+            added, skipped = merged
+            st.info(f"🧮 Added {added:,} new transactions to your history ({skipped:,} already there).")
 
         st.subheader("📈 Summary by Category")
-        summary = get_summary(df)
+        if cube is not None:
+            summary = cube.category_totals()
+            st.caption(f"Across all uploaded history: {cube.transactions:,} transactions.")
+        else:
+            summary = transactions.category_totals()
         st.dataframe(summary)
 
-        fig = px.bar(summary, x=summary.index, y='Amount', title="Spending by Category")
+        fig, pie_fig = category_figures(summary)
         st.plotly_chart(fig)
-
-        pie_fig = px.pie(summary.reset_index(), names='Category', values='Amount', title="Spending Distribution")
         st.plotly_chart(pie_fig)
 
         st.subheader("🔮 Expense Forecast")
         if st.checkbox("Show Forecast for Next 3 Months"):
-            forecast_df, error = forecast_expense(df)
+            model = "seasonal" if st.checkbox("Seasonal model (needs 2+ years of data)") else "linear"
+            monthly = cube.monthly_totals() if cube is not None else transactions.monthly_totals()
+            forecast_df, error, fig2 = forecast_view(monthly, model)
             if error:
                 st.warning(error)
             else:
                 st.dataframe(forecast_df)
-                fig2 = px.line(forecast_df, x='Month', y='Predicted_Expense', title='Forecasted Expenses')
                 st.plotly_chart(fig2)
 
+    # Offered whenever there is history, with or without an upload attached
+    if cube is not None and cube.transactions and st.button("🗑️ Clear transaction history"):
+        cube.clear()
+        # The attached upload counts as cleared too, not merged straight back;
+        # uploading the file again merges it as usual
+        if uploaded_csv is not None:
+            if "cleared_uploads" not in st.session_state:
+                st.session_state.cleared_uploads = set()
+            st.session_state.cleared_uploads.add(upload_key(uploaded_csv))
+        st.rerun()
+
 
 # ========== 🤖 TAB 3: Chatbot ==========
 
@@ -255,10 +416,20 @@ with tabs[2]:
 
     if user_input.strip():
         with st.spinner("Thinking..."):
-            response = ask_finance_bot(user_input)
+            try:
+                response_stream = ask_finance_bot(user_input, stream=True)
+            except ValueError as e:
+                response_stream = None
+                st.error(str(e))
+        if response_stream is not None:
             st.markdown("### 🧠 Answer")
-            st.success(response)
-
-
+            st.write_stream(response_stream)
 
 
+# ==== Startup budget ====
+# Measured once per session on the first run, before any user interaction
+if "startup_seconds" not in st.session_state:
+    st.session_state.startup_seconds = time.perf_counter() - _START
+    if st.session_state.startup_seconds > STARTUP_BUDGET_S:
+        print(f"[WARN] Cold start took {st.session_state.startup_seconds:.2f}s "
+              f"(budget {STARTUP_BUDGET_S:.2f}s)")
@@ -0,0 +1,87 @@
+# batch_qa.py
+#
+# Run a list of questions against one or more financial PDFs and write the
+# answers as JSONL or CSV.
+#
+#   python batch_qa.py --questions questions.txt --pdf data/uploaded_pdfs/*.pdf --output answers.csv
+#   python batch_qa.py --questions questions.jsonl --file-hash <hash> <hash> --output answers.jsonl
+
+import os
+import sys
+import csv
+import json
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from modules.pdf_qa_bot import ask_pdf_questions, BATCH_QA_WORKERS
+
+
+def read_questions(path):
+    # .txt: one question per line; .csv / .jsonl: a "question" column/field
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8") as f:
+        if extension == ".csv":
+            return [row["question"] for row in csv.DictReader(f)]
+        if extension in (".jsonl", ".ndjson"):
+            return [json.loads(line)["question"] for line in f if line.strip()]
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def resolve_file_hashes(pdf_paths, file_hashes):
+    from modules.pdf_processor import get_file_hash
+    from modules.ingestion import ingest_pdf, ensure_lexical_index
+    from modules.pinecone_handler import vectors_exist_in_pinecone
+
+    hashes = list(file_hashes or [])
+    for path in pdf_paths or []:
+        file_hash = get_file_hash(path)
+        if vectors_exist_in_pinecone(file_hash):
+            ensure_lexical_index(path, file_hash)
+        else:
+            print(f"📄 Indexing {os.path.basename(path)}...", file=sys.stderr)
+            count = ingest_pdf(path, file_hash)
+            print(f"📥 Uploaded {count} chunks from {os.path.basename(path)}.", file=sys.stderr)
+        hashes.append(file_hash)
+    return list(dict.fromkeys(hashes))
+
+
+def write_results(results, output):
+    if output and output.lower().endswith(".csv"):
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["question", "answer", "seconds"])
+            writer.writeheader()
+            writer.writerows(results)
+        return
+
+    f = open(output, "w", encoding="utf-8") if output else sys.stdout
+    try:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if output:
+            f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a batch of questions over financial PDFs.")
+    parser.add_argument("--questions", required=True, help="Questions file (.txt, .csv or .jsonl)")
+    parser.add_argument("--pdf", nargs="*", default=[], help="PDF files to query (indexed first if needed)")
+    parser.add_argument("--file-hash", nargs="*", default=[], help="Already-indexed document hashes")
+    parser.add_argument("--output", help="Output file (.jsonl or .csv); JSONL to stdout if omitted")
+    parser.add_argument("--workers", type=int, default=BATCH_QA_WORKERS, help="Questions answered concurrently")
+    args = parser.parse_args(argv)
+
+    questions = read_questions(args.questions)
+    file_hashes = resolve_file_hashes(args.pdf, args.file_hash)
+    if not file_hashes:
+        parser.error("give at least one --pdf or --file-hash")
+
+    results = ask_pdf_questions(questions, file_hashes, max_workers=args.workers)
+    write_results(results, args.output)
+    print(f"✅ Answered {len(results)} questions over {len(file_hashes)} document(s).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
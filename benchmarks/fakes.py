@@ -0,0 +1,184 @@
+# benchmarks/fakes.py
+#
+# In-process stand-ins for the network services, so benchmarks run offline
+# and measure this code rather than someone else's datacenter:
+#   FakeVectorStore     - Pinecone: brute-force cosine search over numpy arrays
+#   FakeGroqServer      - Groq: a local OpenAI-style /chat/completions endpoint
+#                         (plain and streamed), so the real pooled LLMClient runs
+#   FakeEmbeddingService - deterministic hash vectors, only for machines without
+#                         sentence-transformers; its throughput is not the model's
+# Optional per-call latencies approximate the real network round trips.
+
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from modules.vector_store import VectorStore, EMBEDDING_DIM
+
+
+# === Pinecone ===
+class FakeVectorStore(VectorStore):
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, dimension: int = EMBEDDING_DIM):
+        self.latency = latency_ms / 1000
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._namespaces = {}  # namespace -> (unit vectors, ids, metadata)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _normalize(self, values):
+        matrix = np.asarray(values, dtype="float32").reshape(-1, self.dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def upsert(self, vectors, namespace):
+        self._wait()
+        if not vectors:
+            return
+        values = self._normalize([v["values"] for v in vectors])
+        with self._lock:
+            matrix, ids, metadata = self._namespaces.get(namespace, (np.zeros((0, self.dimension), "float32"), [], []))
+            rows = {vid: i for i, vid in enumerate(ids)}
+            ids, metadata, appended = list(ids), list(metadata), []
+            matrix = matrix.copy()
+            for vector, row_values in zip(vectors, values):
+                row = rows.get(vector["id"])
+                if row is None:
+                    rows[vector["id"]] = len(ids)
+                    ids.append(vector["id"])
+                    metadata.append(vector.get("metadata", {}))
+                    appended.append(row_values)
+                else:
+                    matrix[row] = row_values
+                    metadata[row] = vector.get("metadata", {})
+            if appended:
+                matrix = np.vstack([matrix, np.stack(appended)])
+            self._namespaces[namespace] = (matrix, ids, metadata)
+
+    def query(self, vector, top_k=5, namespace=None):
+        self._wait()
+        entry = self._namespaces.get(namespace)
+        if entry is None or not entry[1]:
+            return []
+        matrix, ids, metadata = entry
+        scores = matrix @ self._normalize(vector)[0]
+        top = np.argsort(-scores)[:top_k]
+        return [{"id": ids[row], "score": float(scores[row]), "metadata": metadata[row]} for row in top]
+
+    def exists(self, namespace):
+        self._wait()
+        entry = self._namespaces.get(namespace)
+        return entry is not None and bool(entry[1])
+
+    def delete(self, ids, namespace):
+        self._wait()
+        drop = set(ids)
+        with self._lock:
+            entry = self._namespaces.get(namespace)
+            if entry is None or not drop:
+                return
+            matrix, current_ids, metadata = entry
+            keep = [i for i, vid in enumerate(current_ids) if vid not in drop]
+            self._namespaces[namespace] = (matrix[keep], [current_ids[i] for i in keep], [metadata[i] for i in keep])
+
+
+# === Groq ===
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as with the real API
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(server.first_token_latency)
+
+        if not payload.get("stream"):
+            body = json.dumps({"choices": [{"message": {"role": "assistant", "content": server.answer}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for token in server.answer.split(" "):
+                time.sleep(server.token_latency)
+                event = {"choices": [{"delta": {"content": token + " "}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client closed the stream early
+
+
+class FakeGroqServer:
+    # Serves on 127.0.0.1 from a background thread; point GROQ_BASE_URL at
+    # base_url before modules.llm_client is imported
+    def __init__(self, first_token_ms: float = 0.0, token_ms: float = 0.0,
+                 answer: str = "**Answer:** 29 million CHF (2024) " + "according to the statements " * 10):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.first_token_latency = first_token_ms / 1000
+        self.httpd.token_latency = token_ms / 1000
+        self.httpd.answer = answer.strip()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-groq", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# === Embeddings ===
+class FakeEmbeddingService:
+    def __init__(self, dimension: int = EMBEDDING_DIM):
+        self.dimension = dimension
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension, dtype=np.float32)
+
+    def encode(self, texts) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.stack([self._vector(text) for text in texts])
+
+    async def aencode(self, texts) -> np.ndarray:
+        return await asyncio.to_thread(self.encode, texts)
+
+
+def install_fakes(store: VectorStore, embedding_service=None):
+    # Every module that looked the singletons up by name gets the stand-in
+    from modules import pinecone_handler, retriever, ingestion, embedder
+
+    for module in (pinecone_handler, retriever, ingestion):
+        module.get_vector_store = lambda: store
+    if embedding_service is not None:
+        for module in (pinecone_handler, embedder):
+            module.get_embedding_service = lambda: embedding_service
@@ -0,0 +1,312 @@
+# benchmarks/suite.py
+#
+# End-to-end performance suite. Runs offline: Pinecone and Groq are replaced
+# by the in-process fakes in benchmarks/fakes.py, and every index and cache is
+# written to a throwaway directory with the embedding and answer caches off,
+# so each run measures real work. Results go to JSON for comparing runs.
+#
+#   python -m benchmarks.suite --output bench.json
+#   python -m benchmarks.suite --output after.json --compare bench.json
+#   python -m benchmarks.suite --only expenses --rows 5000000
+#
+# Sections:
+#   pdf       pages/s of extract_text_and_tables_from_text_pdf and of OCR
+#             (first --ocr-pages pages) for each PDF in --pdf-dir
+#   embed     chunks/s of embed_texts over the extracted chunks
+#   qa        p50/p99 latency of retrieve_top_chunks and ask_pdf_question
+#             over the PDFs indexed through ingest_pdf
+#   expenses  rows/s of categorize_expenses and forecast_expense on a
+#             synthetic multi-million-row export
+
+import os
+import sys
+import glob
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+SECTIONS = ("pdf", "embed", "qa", "expenses")
+
+QUESTIONS = [
+    "What was the total revenue in 2024?",
+    "What is the net profit for the year?",
+    "How much cash and cash equivalents were held at year end?",
+    "What were the total assets?",
+    "What dividend per share was proposed?",
+    "How much was spent on research and development?",
+    "What is the operating profit margin?",
+    "What were the income taxes paid?",
+    "How much debt matures within one year?",
+    "What were the employee benefit expenses?",
+]
+
+
+# === Environment ===
+def configure_offline(work_dir: str, groq_url: str):
+    # Must run before any modules.* import: they read their config at import
+    for name, path in {
+        "BM25_INDEX_DIR": "bm25",
+        "CHUNK_CACHE_DIR": "chunks",
+        "DOCUMENT_REGISTRY_DIR": "",
+        "EMBEDDING_CACHE_DIR": "embeddings",
+        "UPSERT_MANIFEST_DIR": "manifests",
+        "RESPONSE_CACHE_PATH": "responses.sqlite3",
+        "LOCAL_INDEX_DIR": "",
+    }.items():
+        os.environ[name] = os.path.join(work_dir, path)
+    os.environ["EMBEDDING_CACHE"] = "0"
+    os.environ["RESPONSE_CACHE"] = "0"
+    os.environ["GROQ_BASE_URL"] = groq_url
+    os.environ["GROQ_API_KEY"] = "offline-benchmark"
+
+
+def embedding_backend(fake: bool):
+    # The real model when it is installed; hash vectors otherwise
+    from benchmarks.fakes import FakeEmbeddingService
+
+    if not fake:
+        try:
+            import sentence_transformers  # noqa: F401
+            from modules.embedding_cache import EMBEDDING_MODEL_NAME
+            return None, EMBEDDING_MODEL_NAME
+        except ImportError:
+            print("[WARN] sentence-transformers not installed; using fake embeddings", file=sys.stderr)
+    return FakeEmbeddingService(), "fake"
+
+
+# === Measurement ===
+def latency_stats(seconds: list) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def throughput(count: int, seconds: float, unit: str) -> dict:
+    return {unit: count, "seconds": round(seconds, 4), f"{unit}_per_s": round(count / seconds, 2) if seconds else None}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def guarded(fn, *args, **kwargs) -> dict:
+    # One failing benchmark (e.g. no tesseract binary for OCR) is recorded
+    # and the rest of the suite still runs
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        print(f"[ERROR] {fn.__name__} failed: {e}", file=sys.stderr)
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+# === Sections ===
+def bench_pdf(pdfs: list, ocr_pages: int) -> tuple:
+    from modules.pdf_processor import (
+        extract_text_and_tables_from_text_pdf, iter_scanned_pdf_chunks, get_page_count
+    )
+
+    def text(path):
+        pages = get_page_count(path)
+        chunks, seconds = timed(extract_text_and_tables_from_text_pdf, path, os.path.basename(path))
+        text.chunks += chunks
+        return {**throughput(pages, seconds, "pages"), "chunks": len(chunks)}
+    text.chunks = []
+
+    def ocr(path):
+        pages = min(ocr_pages, get_page_count(path))
+        chunks, seconds = timed(lambda: list(iter_scanned_pdf_chunks(path, os.path.basename(path),
+                                                                     page_numbers=range(pages))))
+        return {**throughput(pages, seconds, "pages"), "chunks": len(chunks)}
+
+    results = {}
+    for path in pdfs:
+        name = os.path.basename(path)
+        results[name] = {"text": guarded(text, path)}
+        if ocr_pages:
+            results[name]["ocr"] = guarded(ocr, path)
+    return results, text.chunks
+
+
+def bench_embed(chunks: list, limit: int) -> dict:
+    from modules.pinecone_handler import embed_texts, chunk_text
+
+    texts = [chunk_text(c) for c in chunks if chunk_text(c)][:limit]
+    if not texts:
+        texts = [f"{q} Note {i}: figures in CHF millions." for i, q in enumerate(QUESTIONS * (limit // len(QUESTIONS) + 1))][:limit]
+    embed_texts(texts[:8])  # model load is not throughput
+    _, seconds = timed(embed_texts, texts)
+    return throughput(len(texts), seconds, "chunks")
+
+
+def bench_qa(pdfs: list, queries: int) -> dict:
+    from modules.pdf_processor import get_file_hash
+    from modules.ingestion import ingest_pdf
+    from modules.retriever import retrieve_top_chunks
+    from modules.pdf_qa_bot import ask_pdf_question
+
+    file_hashes, indexed = [], {}
+    for path in pdfs:
+        file_hash = get_file_hash(path)
+        count, seconds = timed(ingest_pdf, path, file_hash)
+        indexed[os.path.basename(path)] = throughput(count, seconds, "chunks")
+        if count:
+            file_hashes.append(file_hash)
+    if not file_hashes:
+        return {"ingest": indexed, "error": "no PDF produced any chunks"}
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(queries)]
+    retrieve_top_chunks(questions[0], file_hashes)  # warm-up: index loads, connections
+    ask_pdf_question(questions[0], file_hashes)
+
+    retrieval = [timed(retrieve_top_chunks, q, file_hashes)[1] for q in questions]
+    answers = [timed(ask_pdf_question, q, file_hashes)[1] for q in questions]
+    return {
+        "ingest": indexed,
+        "documents": len(file_hashes),
+        "retrieve_top_chunks": latency_stats(retrieval),
+        "ask_pdf_question": latency_stats(answers),
+    }
+
+
+def synthetic_export(rows: int, distinct: int, months: int = 36, seed: int = 0):
+    import pandas as pd
+    from benchmarks.bench_categorize import synthetic_transactions
+
+    df = synthetic_transactions(rows, distinct, seed)
+    days = np.random.default_rng(seed).integers(0, months * 30, rows)
+    df.insert(0, "Date", pd.Timestamp("2022-01-01") + pd.to_timedelta(days, unit="D"))
+    return df
+
+
+def bench_expenses(rows: int, distinct: int) -> dict:
+    from modules.expense_analyzer import categorize_expenses
+    from modules.trend_forecaster import forecast_expense
+
+    df = synthetic_export(rows, distinct)
+    categorized, categorize_s = timed(categorize_expenses, df.copy())
+    _, linear_s = timed(forecast_expense, categorized, model="linear")
+    _, seasonal_s = timed(forecast_expense, categorized, model="seasonal")
+    return {
+        "categorize_expenses": throughput(rows, categorize_s, "rows"),
+        "forecast_expense": throughput(rows, linear_s, "rows"),
+        "forecast_expense_seasonal": throughput(rows, seasonal_s, "rows"),
+    }
+
+
+# === Reporting ===
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(previous: dict, current: dict, threshold: float = 10.0):
+    # Rates (*_per_s) are better higher, latencies better lower; changes
+    # within `threshold` percent are treated as noise
+    before, after = flatten(previous["results"]), flatten(current["results"])
+    print(f"{'metric':70} {'before':>12} {'after':>12} {'change':>8}")
+    for metric in sorted(set(before) & set(after)):
+        if not metric.endswith(("_per_s", "_ms")):
+            continue
+        old, new = before[metric], after[metric]
+        change = (new - old) / old * 100 if old else float("nan")
+        better = change > 0 if metric.endswith("_per_s") else change < 0
+        mark = "  " if not abs(change) >= threshold else "✅" if better else "❌"
+        print(f"{metric:70} {old:12.2f} {new:12.2f} {change:+7.1f}% {mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end performance benchmarks.")
+    parser.add_argument("--output", help="Write results as JSON here (stdout if omitted)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change flagged when comparing")
+    parser.add_argument("--only", nargs="*", choices=SECTIONS, help="Sections to run (default: all)")
+    parser.add_argument("--pdf-dir", default=os.path.join("data", "uploaded_pdfs"))
+    parser.add_argument("--ocr-pages", type=int, default=5, help="Pages per PDF to OCR (0 skips OCR)")
+    parser.add_argument("--embed-chunks", type=int, default=2000, help="Chunks to embed")
+    parser.add_argument("--queries", type=int, default=200, help="Questions per latency benchmark")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Synthetic transactions")
+    parser.add_argument("--distinct", type=int, default=5_000, help="Distinct descriptions among them")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Hash vectors instead of the model")
+    parser.add_argument("--store-latency-ms", type=float, default=0.0, help="Fake Pinecone round trip")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Fake Groq time to first token")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="Fake Groq time per streamed token")
+    args = parser.parse_args(argv)
+    sections = args.only or SECTIONS
+    pdfs = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+
+    from benchmarks.fakes import FakeGroqServer, FakeVectorStore, install_fakes
+
+    with tempfile.TemporaryDirectory(prefix="fingenai-bench-") as work_dir, \
+            FakeGroqServer(args.llm_latency_ms, args.token_latency_ms) as groq:
+        configure_offline(work_dir, groq.base_url)
+        embeddings, model = embedding_backend(args.fake_embeddings)
+        install_fakes(FakeVectorStore(args.store_latency_ms), embeddings)
+
+        results, chunks = {}, []
+        if "pdf" in sections or "embed" in sections:
+            print(f"📄 PDF extraction ({len(pdfs)} files)...", file=sys.stderr)
+            results["pdf"], chunks = bench_pdf(pdfs, args.ocr_pages if "pdf" in sections else 0)
+            if "pdf" not in sections:
+                del results["pdf"]
+        if "embed" in sections:
+            print("🧮 Embedding...", file=sys.stderr)
+            results["embed"] = guarded(bench_embed, chunks, args.embed_chunks)
+        if "qa" in sections:
+            print("🔍 Retrieval and Q&A...", file=sys.stderr)
+            results["qa"] = guarded(bench_qa, pdfs, args.queries)
+        if "expenses" in sections:
+            print(f"📊 Expenses ({args.rows:,} rows)...", file=sys.stderr)
+            results["expenses"] = guarded(bench_expenses, args.rows, args.distinct)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "embedding_model": model,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
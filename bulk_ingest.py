@@ -0,0 +1,226 @@
+# bulk_ingest.py
+#
+# Index a folder of financial PDFs without the web app, so the app only ever
+# queries indexes that already exist. PDFs are discovered, deduplicated by file
+# hash and ingested several at a time through the same extract -> embed ->
+# upsert pipeline the upload handler uses. Every finished file is logged to a
+# JSONL run manifest with its throughput; re-running the same command skips
+# what is done and retries what failed, and a half-uploaded document resumes
+# from its own upsert manifest.
+#
+#   python bulk_ingest.py data/uploaded_pdfs
+#   python bulk_ingest.py filings/ more/report.pdf --workers 8 --manifest indices/filings.jsonl
+#   python bulk_ingest.py filings/2023 filings/2024 --versions
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BULK_INGEST_WORKERS = int(os.getenv("BULK_INGEST_WORKERS", "4"))  # Documents ingested concurrently
+BULK_INGEST_MANIFEST = os.getenv("BULK_INGEST_MANIFEST", os.path.join("indices", "bulk_ingest.jsonl"))
+
+# Statuses after which a file needs no more work
+FINISHED = ("indexed", "exists", "empty")
+
+
+# === Run manifest ===
+# One JSON line per processed file; the latest line for a file hash wins.
+class RunManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from an interrupted run
+                    self.entries[entry["file_hash"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def is_finished(self, file_hash: str) -> bool:
+        return self.entries.get(file_hash, {}).get("status") in FINISHED
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.entries[entry["file_hash"]] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# === Discovery ===
+def discover_pdfs(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found += [os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf")]
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            print(f"[WARN] No such file or directory: {path}", file=sys.stderr)
+    return list(dict.fromkeys(os.path.abspath(p) for p in found))
+
+
+def hash_pdfs(paths, workers):
+    # path -> file hash, the same hash the upload handler indexes under.
+    # hashlib releases the GIL, so threads read and hash files in parallel.
+    from modules.pdf_processor import get_file_hash
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(get_file_hash, paths)))
+
+
+def pdf_document_id(path, versions=False):
+    # Files are documents by their path relative to the working directory, so
+    # same-named files in different folders stay apart; with versions=True they
+    # are versions of one document named by the file name
+    return os.path.basename(path) if versions else os.path.relpath(path)
+
+
+def plan_jobs(hashes, versions=False):
+    # One job per document id, as (path, file hash, document id) in order.
+    # Copies with the same hash are ingested once; with versions=True the
+    # versions of one file name go through the same job, oldest first, so each
+    # re-indexes incrementally on top of the one before.
+    seen, duplicates = {}, []
+    for path, file_hash in hashes.items():
+        if file_hash in seen:
+            duplicates.append((path, seen[file_hash]))
+        else:
+            seen[file_hash] = path
+
+    jobs = defaultdict(list)
+    for file_hash, path in seen.items():
+        key = pdf_document_id(path, versions)
+        jobs[key].append((path, file_hash, key))
+    for chain in jobs.values():
+        chain.sort(key=lambda version: os.path.getmtime(version[0]))
+    return list(jobs.values()), duplicates
+
+
+# === Ingestion ===
+def ingest_file(path, file_hash, document_id=None):
+    from modules.pdf_processor import get_page_count
+    from modules.ingestion import ingest_pdf, ensure_lexical_index
+    from modules.chunk_cache import cached_chunk_count
+    from modules.pinecone_handler import vectors_exist_in_pinecone
+
+    start = time.perf_counter()
+    pages = get_page_count(path)
+    if vectors_exist_in_pinecone(file_hash):
+        ensure_lexical_index(path, file_hash)
+        status, chunks = "exists", cached_chunk_count(file_hash)
+    else:
+        chunks = ingest_pdf(path, file_hash, document_id=document_id)
+        # An interrupted upload leaves its upsert manifest incomplete
+        if not vectors_exist_in_pinecone(file_hash):
+            status = "incomplete"
+        else:
+            status = "indexed" if chunks else "empty"
+    seconds = time.perf_counter() - start
+
+    return {
+        "path": path,
+        "file_hash": file_hash,
+        "status": status,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "pages_per_s": round(pages / seconds, 2) if seconds else None,
+        "chunks_per_s": round((chunks or 0) / seconds, 2) if seconds else None,
+    }
+
+
+def run_job(versions, manifest):
+    results = []
+    for path, file_hash, key in versions:
+        try:
+            result = ingest_file(path, file_hash, key)
+        except Exception as e:
+            result = {"path": path, "file_hash": file_hash, "status": "failed", "error": str(e)}
+        manifest.record(result)
+        report(result)
+        results.append(result)
+    return results
+
+
+def report(result):
+    name = os.path.basename(result["path"])
+    if result["status"] == "failed":
+        print(f"❌ {name}: {result['error']}", file=sys.stderr)
+        return
+    print(f"{'📥' if result['status'] == 'indexed' else '✅'} {name} [{result['status']}]: "
+          f"{result['chunks'] or 0} chunks from {result['pages']} pages in {result['seconds']:.1f}s "
+          f"({result['pages_per_s'] or 0:.1f} pages/s, {result['chunks_per_s'] or 0:.1f} chunks/s)",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index a directory of financial PDFs without the web app.")
+    parser.add_argument("paths", nargs="*", default=[os.path.join("data", "uploaded_pdfs")],
+                        help="PDF files or directories (searched recursively)")
+    parser.add_argument("--workers", type=int, default=BULK_INGEST_WORKERS, help="Documents ingested concurrently")
+    parser.add_argument("--pdf-workers", type=int,
+                        help="Extraction/OCR processes per document (default: CPUs / --workers)")
+    parser.add_argument("--manifest", default=BULK_INGEST_MANIFEST, help="Run manifest (JSONL) to resume from")
+    parser.add_argument("--versions", action="store_true",
+                        help="Treat same-named PDFs in different folders as versions of one document")
+    args = parser.parse_args(argv)
+
+    # Documents run side by side, so each one's page-parallel extraction gets
+    # a share of the CPUs; set before the PDF stack reads its config
+    share = str(args.pdf_workers or max(1, (os.cpu_count() or 1) // max(1, args.workers)))
+    for name in ("PDF_WORKERS", "OCR_WORKERS"):
+        if args.pdf_workers or name not in os.environ:
+            os.environ[name] = share
+
+    paths = discover_pdfs(args.paths)
+    if not paths:
+        parser.error("no PDFs found")
+
+    manifest = RunManifest(args.manifest)
+    hashes = hash_pdfs(paths, args.workers)
+    jobs, duplicates = plan_jobs(hashes, args.versions)
+    for path, original in duplicates:
+        print(f"🔁 {os.path.basename(path)} is a copy of {original}; skipping.", file=sys.stderr)
+
+    pending = [[job for job in versions if not manifest.is_finished(job[1])] for versions in jobs]
+    pending = [versions for versions in pending if versions]
+    skipped = sum(len(versions) for versions in jobs) - sum(len(versions) for versions in pending)
+    print(f"📄 {len(paths)} PDFs: {len(duplicates)} duplicates, {skipped} already done, "
+          f"{sum(len(v) for v in pending)} to ingest with {args.workers} workers.", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for future in as_completed([pool.submit(run_job, versions, manifest) for versions in pending]):
+            results += future.result()
+    seconds = time.perf_counter() - start
+
+    pages = sum(r.get("pages") or 0 for r in results if r["status"] != "failed")
+    chunks = sum(r.get("chunks") or 0 for r in results if r["status"] != "failed")
+    failed = [r for r in results if r["status"] not in FINISHED]
+    print(f"✅ {len(results) - len(failed)} of {len(results)} documents done in {seconds:.1f}s "
+          f"({pages / seconds if seconds else 0:.1f} pages/s, {chunks / seconds if seconds else 0:.1f} chunks/s).",
+          file=sys.stderr)
+    if failed:
+        print(f"⚠️ {len(failed)} not finished; re-run the same command to retry them.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
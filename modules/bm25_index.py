@@ -0,0 +1,117 @@
+# modules/bm25_index.py
+
+import os
+import re
+import math
+import heapq
+import pickle
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+# === Config ===
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", os.path.join("indices", "bm25"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "what", "are", "the", "is", "in", "of", "as", "at", "a", "an", "and", "or", "for",
+    "to", "by", "on", "was", "were", "how", "much", "many", "which", "did", "does", "do",
+}
+
+# Words plus figures such as "1,234.5", "29", "2024" or "IAS 28" parts
+_TOKEN_RE = re.compile(r"\w+(?:[.,]\w+)*")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def query_terms(query: str) -> list:
+    return [t for t in dict.fromkeys(tokenize(query)) if t not in STOPWORDS]
+
+
+# === Index ===
+# Per-document inverted index. BM25 weights are computed once at build time,
+# so a query is just a sum over the postings of its terms.
+class BM25Index:
+    def __init__(self, ids, metadata, postings):
+        self.ids = ids                # row -> chunk id (same ids as the vector store)
+        self.metadata = metadata      # row -> vector-store style metadata
+        self.postings = postings      # term -> [(row, weight), ...]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str, top_k: int = 20) -> list:
+        scores = defaultdict(float)
+        for term in query_terms(query):
+            for row, weight in self.postings.get(term, ()):
+                scores[row] += weight
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [{"id": self.ids[row], "score": score, "metadata": self.metadata[row]} for row, score in best]
+
+    def save(self, file_hash: str):
+        os.makedirs(BM25_INDEX_DIR, exist_ok=True)
+        path = _index_path(file_hash)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+
+class BM25Builder:
+    # Fed one chunk at a time during ingestion
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.metadata = []
+        self.lengths = []
+        self.term_counts = defaultdict(list)  # term -> [(row, tf), ...]
+
+    def add(self, chunk_id: str, text: str, metadata: dict):
+        row = len(self.ids)
+        tokens = tokenize(text)
+        self.ids.append(chunk_id)
+        self.metadata.append(metadata)
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.term_counts[term].append((row, tf))
+
+    def build(self) -> BM25Index:
+        n_docs = len(self.ids)
+        avg_length = (sum(self.lengths) / n_docs) if n_docs else 0.0
+        norms = [self.k1 * (1 - self.b + self.b * (length / avg_length if avg_length else 0.0))
+                 for length in self.lengths]
+
+        postings = {}
+        for term, entries in self.term_counts.items():
+            idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            postings[term] = [
+                (row, idf * tf * (self.k1 + 1) / (tf + norms[row]))
+                for row, tf in entries
+            ]
+        return BM25Index(self.ids, self.metadata, postings)
+
+
+# === Persistence ===
+def _index_path(file_hash: str) -> str:
+    return os.path.join(BM25_INDEX_DIR, f"{file_hash}.bm25")
+
+
+def bm25_index_exists(file_hash: str) -> bool:
+    return os.path.exists(_index_path(file_hash))
+
+
+@lru_cache(maxsize=64)
+def _load(path: str, mtime_ns: int) -> BM25Index:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_bm25_index(file_hash: str):
+    path = _index_path(file_hash)
+    try:
+        return _load(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
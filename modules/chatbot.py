@@ -1,6 +1,5 @@
-import os
 from dotenv import load_dotenv
-import groq
+from modules.llm_client import get_llm_client, require_api_key
 
 
 
@@ -8,24 +7,66 @@ import groq
 dotenv_loaded = load_dotenv()
 print(" .env loaded:", dotenv_loaded)
 
-#  Read the key
-api_key = os.getenv("GROQ_API_KEY")
 
+CHAT_MODEL = "llama3-8b-8192"
+CHAT_CACHE_SCOPE = "chat"
 
-if not api_key:
-    raise ValueError(" GROQ_API_KEY not found. Make sure .env file is correct and 'python-dotenv' is installed.")
 
-print(" Loaded key starts with:", api_key[:10], "********")
+def _embed_question(prompt):
+    # The chatbot works without sentence-transformers; it then only gets
+    # exact cache hits
+    try:
+        from modules.pinecone_handler import embed_query
+        return embed_query(prompt)
+    except ImportError:
+        return None
 
-#  Create client
-client = groq.Groq(api_key=api_key)
 
-def ask_finance_bot(prompt):
-    response = client.chat.completions.create(
-        model="llama3-8b-8192",
-        messages=[
-            {"role": "system", "content": "You are a financial assistant."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content
+def ask_finance_bot(prompt, stream=False):
+    # General-knowledge answers don't depend on any document, so one shared
+    # cache scope; paraphrases hit it semantically.
+    # stream=True returns a generator of answer pieces as Groq produces them.
+    from modules.response_cache import get_response_cache, is_cacheable, RESPONSE_CACHE_ENABLED
+
+    embedding = None
+    if RESPONSE_CACHE_ENABLED:
+        # Exact repeats are answered without loading the embedding model;
+        # only a miss embeds the question for the semantic lookup (and put)
+        cached = get_response_cache().get(CHAT_CACHE_SCOPE, prompt)
+        if cached is None:
+            embedding = _embed_question(prompt)
+            if embedding is not None:
+                cached = get_response_cache().get(CHAT_CACHE_SCOPE, prompt, embedding)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+
+    def remember(answer):
+        if RESPONSE_CACHE_ENABLED and is_cacheable(answer):
+            get_response_cache().put(CHAT_CACHE_SCOPE, prompt, answer, embedding)
+
+    # Same pooled client as PDF Q&A (modules/llm_client.py). A missing key
+    # raises ValueError here, before any streaming starts.
+    require_api_key()
+    client = get_llm_client()
+    messages = [
+        {"role": "system", "content": "You are a financial assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+    if stream:
+        def pieces():
+            collected = []
+            try:
+                for delta in client.stream_chat(messages, CHAT_MODEL):
+                    collected.append(delta)
+                    yield delta
+            except Exception as e:
+                print(f"[ERROR] Groq call failed: {e}")
+                yield "❌ Failed to generate answer from Groq."
+                return
+            remember("".join(collected))
+        return pieces()
+
+    answer = client.chat(messages, CHAT_MODEL)
+    remember(answer)
+    return answer
@@ -0,0 +1,169 @@
+# modules/chunk_cache.py
+
+import os
+import glob
+import uuid
+
+# === Config ===
+# Extracted chunks are cached on disk as one Parquet file per file hash
+# (see pdf_processor.get_file_hash), so a known PDF never goes through
+# pdfplumber/OCR again, across sessions and restarts.
+CHUNK_CACHE_DIR = os.getenv("CHUNK_CACHE_DIR", os.path.join("cache", "chunks"))
+CHUNK_CACHE_MAX_MB = float(os.getenv("CHUNK_CACHE_MAX_MB", "512"))
+WRITE_BATCH_ROWS = 1024
+
+_FIELDS = ("type", "source", "page_number", "row_index", "text", "table_text")
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("type", pa.string()),
+        ("source", pa.string()),
+        ("page_number", pa.int32()),
+        ("row_index", pa.int32()),
+        ("text", pa.string()),
+        ("table_text", pa.string()),
+    ])
+
+
+def _available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _cache_path(file_hash: str) -> str:
+    return os.path.join(CHUNK_CACHE_DIR, f"{file_hash}.parquet")
+
+
+def _to_columns(chunks):
+    return {field: [chunk.get(field) for chunk in chunks] for field in _FIELDS}
+
+
+# === Read ===
+def load_cached_chunks(file_hash: str):
+    # Returns the cached chunk list, or None on a miss
+    path = _cache_path(file_hash)
+    if not file_hash or not _available() or not os.path.exists(path):
+        return None
+
+    import pyarrow.parquet as pq
+
+    try:
+        rows = pq.read_table(path).to_pylist()
+    except Exception as e:
+        print(f"[ERROR] Unreadable chunk cache for {file_hash}, ignoring: {e}")
+        return None
+
+    os.utime(path)  # Mark as recently used for eviction
+    # Columns a chunk never had come back as nulls; drop them to restore its shape
+    return [{k: v for k, v in row.items() if v is not None} for row in rows]
+
+
+def cached_chunk_count(file_hash: str):
+    path = _cache_path(file_hash)
+    if not file_hash or not _available() or not os.path.exists(path):
+        return None
+
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+# === Write ===
+class ChunkCacheWriter:
+    # Appends chunks to a temporary Parquet file in row groups and only
+    # publishes it on commit(), so an interrupted extraction never leaves a
+    # partial document in the cache.
+    def __init__(self, file_hash: str):
+        import pyarrow.parquet as pq
+
+        os.makedirs(CHUNK_CACHE_DIR, exist_ok=True)
+        self.path = _cache_path(file_hash)
+        # Unique per writer: concurrent sessions are threads of one process
+        self.tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self._writer = pq.ParquetWriter(self.tmp_path, _schema(), compression="zstd")
+        self._pending = []
+
+    def write(self, chunk: dict):
+        self._pending.append(chunk)
+        if len(self._pending) >= WRITE_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+
+        if self._pending:
+            self._writer.write_table(pa.Table.from_pydict(_to_columns(self._pending), schema=_schema()))
+            self._pending = []
+
+    def commit(self):
+        self._flush()
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+        evict_chunk_cache()
+
+    def abort(self):
+        try:
+            self._writer.close()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+def save_chunks(file_hash: str, chunks: list):
+    if not file_hash or not _available():
+        return
+    writer = ChunkCacheWriter(file_hash)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+
+
+def iter_and_cache(file_hash: str, chunks):
+    # Pass chunks through unchanged while writing them to the cache; the entry
+    # is only published if the source iterator runs to completion.
+    if not file_hash or not _available():
+        yield from chunks
+        return
+
+    writer = ChunkCacheWriter(file_hash)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+
+
+# === Eviction ===
+def evict_chunk_cache(max_mb: float = CHUNK_CACHE_MAX_MB):
+    # Least-recently-used files go first until the cache fits in max_mb
+    entries = []
+    for path in glob.glob(os.path.join(CHUNK_CACHE_DIR, "*.parquet")):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = max_mb * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,83 @@
+# modules/context_packer.py
+
+import os
+from functools import lru_cache
+from rapidfuzz import fuzz
+
+# === Config ===
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # Tokens of retrieved context per prompt
+NEAR_DUPLICATE_RATIO = 95  # rapidfuzz token_set_ratio at or above this counts as a repeat
+
+
+# === Token counting ===
+@lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    # tiktoken when installed (close to Llama 3's tokenizer on English and
+    # figures); otherwise the usual ~4 characters per token estimate
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+# === Packing ===
+def chunk_block(chunk: dict) -> str:
+    return "\n".join(filter(None, [chunk.get("text", ""), chunk.get("table_text", "")]))
+
+
+def _is_near_duplicate(block: str, kept: list) -> bool:
+    normalized = ' '.join(block.lower().split())
+    for other in kept:
+        if normalized == other:
+            return True
+        # Only compare blocks of similar size; a short row is not a repeat of a page
+        if 0.8 <= len(normalized) / max(len(other), 1) <= 1.25 and \
+                fuzz.token_set_ratio(normalized, other) >= NEAR_DUPLICATE_RATIO:
+            return True
+    return False
+
+
+# Orders chunks by relevance (retriever "score", highest first), skips
+# near-duplicates and keeps adding blocks until the token budget is spent.
+# Returns the packed context blocks in that order.
+def pack_context(chunks: list, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> list:
+    ranked = sorted(
+        enumerate(chunks),
+        key=lambda item: (-(item[1].get("score") or 0.0), item[0])
+    )
+
+    blocks = []
+    kept = []
+    used = 0
+    for _, chunk in ranked:
+        block = chunk_block(chunk).strip()
+        if not block or _is_near_duplicate(block, kept):
+            continue
+
+        tokens = count_tokens(block)
+        if used + tokens > max_tokens:
+            if not blocks:
+                # A single oversized chunk still gets its most relevant start in
+                blocks.append(_truncate(block, max_tokens))
+            break
+
+        blocks.append(block)
+        kept.append(' '.join(block.lower().split()))
+        used += tokens
+
+    return blocks
@@ -0,0 +1,187 @@
+# modules/document_registry.py
+
+import os
+import json
+import hashlib
+import threading
+from functools import lru_cache
+
+from modules.vector_store import VECTOR_STORE
+
+# === Config ===
+DOCUMENT_REGISTRY_DIR = os.getenv("DOCUMENT_REGISTRY_DIR", "indices")
+
+
+# === Chunk ids ===
+# Content plus position: the page number and, for identical content repeated
+# on a page, its occurrence. A chunk keeps its id across document versions as
+# long as its page's content and number stay put, so only genuinely new
+# chunks need embedding and upserting.
+def content_chunk_id(chunk: dict, occurrence: int = 0) -> str:
+    content = chunk.get("text") or chunk.get("table_text") or ""
+    key = f"{chunk.get('page_number')}\x1f{occurrence}\x1f{chunk.get('type')}\x1f{content}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def assign_chunk_ids(chunks):
+    # Streams chunks (in page order) through, setting each one's content id
+    seen = {}
+    for chunk in chunks:
+        content = chunk.get("text") or chunk.get("table_text") or ""
+        key = (chunk.get("page_number"), chunk.get("type"), content)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        chunk["id"] = content_chunk_id(chunk, occurrence)
+        yield chunk
+
+
+# === Registry ===
+# One JSON file per vector-store backend tracking every document indexed
+# with content ids. Documents are keyed by a document id (the caller's, or the
+# file name) and each key holds one entry per distinct document under it:
+#   namespace     vector-store namespace (the hash of its first version)
+#   file_hash     hash of the version currently in that namespace
+#   fingerprints  per-page fingerprints of that version
+#   ids           chunk ids currently stored in the namespace
+# plus an alias map (current file hash -> namespace) and the hashes whose
+# namespace now holds a newer version of the same document.
+# An upload only counts as a new version of an entry under its id when at
+# least this share of pages is unchanged; otherwise it is a different document.
+VERSION_MIN_PAGE_OVERLAP = float(os.getenv("VERSION_MIN_PAGE_OVERLAP", "0.5"))
+
+
+class SupersededDocumentError(ValueError):
+    # Raised instead of answering from a namespace that holds a newer version
+    def __init__(self, file_hashes):
+        self.file_hashes = list(file_hashes)
+        super().__init__(f"{len(self.file_hashes)} document(s) were replaced by a newer version; "
+                         "upload the current version to search it.")
+
+
+def page_overlap(old_fingerprints, new_fingerprints) -> float:
+    # Share of pages the two versions have in common, relative to the longer one
+    old, new = set(old_fingerprints), set(new_fingerprints)
+    return len(old & new) / max(len(old), len(new), 1)
+
+
+class DocumentRegistry:
+    def __init__(self, backend: str = VECTOR_STORE, registry_dir: str = DOCUMENT_REGISTRY_DIR):
+        self.path = os.path.join(registry_dir, f"documents-{backend}.json")
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._data = self._read()
+
+    def _stat_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self):
+        self._mtime = self._stat_mtime()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Unreadable document registry {self.path}, starting empty: {e}")
+            data = {}
+        data.setdefault("documents", {})
+        data.setdefault("aliases", {})
+        data.setdefault("superseded", [])
+        # Registries written before several documents could share an id
+        for key, entries in data["documents"].items():
+            if isinstance(entries, dict):
+                data["documents"][key] = [entries]
+        return data
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._data, f, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+        self._mtime = self._stat_mtime()
+
+    def _current(self):
+        # Picks up documents indexed by another process (e.g. batch_qa.py)
+        if self._stat_mtime() != self._mtime:
+            with self._lock:
+                self._data = self._read()
+        return self._data
+
+    def namespace(self, file_hash: str) -> str:
+        # Documents indexed before the registry existed live in their own hash.
+        # A superseded hash would resolve to its namespace's newer content.
+        data = self._current()
+        if file_hash in data["superseded"]:
+            raise SupersededDocumentError([file_hash])
+        return data["aliases"].get(file_hash, file_hash)
+
+    def new_namespace(self, file_hash: str) -> str:
+        # Namespace for a document that is not a version of a registered one:
+        # its own hash, unless that namespace already holds another document
+        # (a superseded first version), then the first free numbered one
+        data = self._current()
+        if file_hash in data["aliases"]:
+            return data["aliases"][file_hash]
+        used = {entry["namespace"] for entries in data["documents"].values() for entry in entries}
+        namespace, n = file_hash, 1
+        while namespace in used:
+            namespace, n = f"{file_hash}-{n}", n + 1
+        return namespace
+
+    def has_content_ids(self, file_hash: str) -> bool:
+        return file_hash in self._current()["aliases"]
+
+    def is_superseded(self, file_hash: str) -> bool:
+        return file_hash in self._current()["superseded"]
+
+    def check_current(self, file_hashes):
+        # file_hashes may be a single hash or any collection of them
+        if isinstance(file_hashes, str):
+            file_hashes = [file_hashes]
+        superseded = [h for h in file_hashes if self.is_superseded(h)]
+        if superseded:
+            raise SupersededDocumentError(superseded)
+
+    def previous_version(self, document_id: str, file_hash: str, fingerprints):
+        # The registered entry this upload replaces, if it is a new version:
+        # the entry under the same id sharing the most pages, above the threshold
+        entries = self._current()["documents"].get(document_id, [])
+        if any(entry["file_hash"] == file_hash for entry in entries):
+            return None
+        best = max(entries, key=lambda entry: page_overlap(entry["fingerprints"], fingerprints), default=None)
+        if best is None or page_overlap(best["fingerprints"], fingerprints) < VERSION_MIN_PAGE_OVERLAP:
+            return None
+        return best
+
+    def record(self, document_id: str, file_hash: str, namespace: str, fingerprints, ids, previous: dict = None):
+        # Registers this version; `previous` is the entry it replaces, if any
+        self._current()
+        with self._lock:
+            entries = self._data["documents"].get(document_id, [])
+            superseded = set(self._data["superseded"])
+            replaced = {file_hash}
+            if previous and previous["file_hash"] != file_hash:
+                replaced.add(previous["file_hash"])
+                self._data["aliases"].pop(previous["file_hash"], None)
+                superseded.add(previous["file_hash"])
+            superseded.discard(file_hash)
+
+            entries = [entry for entry in entries if entry["file_hash"] not in replaced]
+            entries.append({
+                "namespace": namespace,
+                "file_hash": file_hash,
+                "fingerprints": list(fingerprints),
+                "ids": sorted(ids),
+            })
+            self._data["documents"][document_id] = entries
+            self._data["aliases"][file_hash] = namespace
+            self._data["superseded"] = sorted(superseded)
+            self._write()
+
+
+@lru_cache(maxsize=None)
+def get_document_registry() -> DocumentRegistry:
+    return DocumentRegistry()
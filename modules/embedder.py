@@ -1,11 +1,8 @@
 # modules/embedder.py
-import os
 import hashlib
-import pickle
-import faiss
-from sentence_transformers import SentenceTransformer
-
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from modules.vector_store import LocalVectorStore
+from modules.embedding_cache import cached_encode
+from modules.embedding_service import get_embedding_service
 
 def compute_file_hash(filepath):
     with open(filepath, "rb") as f:
@@ -14,7 +11,7 @@ def compute_file_hash(filepath):
 
 def embed_chunks(chunks, file_hash):
     texts = [chunk.get("table_text", "") or chunk.get("text", "") for chunk in chunks]
-    embeddings = model.encode(texts, convert_to_numpy=True)
+    embeddings = cached_encode(texts, get_embedding_service().encode)
 
     # Attach metadata to each embedding
     metadata = []
@@ -30,32 +27,25 @@ def embed_chunks(chunks, file_hash):
     return embeddings, metadata
 
 
+# Local FAISS index for a document, backed by LocalVectorStore so the files
+# under indices/ are the same ones VECTOR_STORE=local queries at runtime.
 def build_faiss_index(chunks, file_hash):
-    index_path = f"indices/{file_hash}.index"
-    metadata_path = f"indices/{file_hash}_metadata.pkl"
+    store = LocalVectorStore()
 
-    if os.path.exists(index_path) and os.path.exists(metadata_path):
+    if store.exists(file_hash):
         print(f"[CACHED] 🔁 Loading index for {file_hash}")
-        index = faiss.read_index(index_path)
-        with open(metadata_path, "rb") as f:
-            metadata = pickle.load(f)
-        return index, metadata
+        return store.open_index(file_hash)
 
     print(f"[PROCESSING] 🔄 Building index for {file_hash}")
-    embeddings = embed_chunks(chunks)
+    embeddings, metadata = embed_chunks(chunks, file_hash)
 
     if embeddings.shape[0] == 0:
         raise ValueError("No embeddings generated.")
 
-    index = faiss.IndexFlatIP(embeddings.shape[1])
-    index.add(embeddings)
-
-    with open(metadata_path, "wb") as f:
-        pickle.dump(chunks, f)
-    faiss.write_index(index, index_path)
-
-    return index, chunks
-
-
-
+    store.upsert([
+        {"id": f"{file_hash}_{i}", "values": embedding, "metadata": meta}
+        for i, (embedding, meta) in enumerate(zip(embeddings, metadata))
+    ], namespace=file_hash)
+    store.flush(file_hash)
 
+    return store.open_index(file_hash)
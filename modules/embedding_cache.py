@@ -0,0 +1,140 @@
+# modules/embedding_cache.py
+
+import os
+import hashlib
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+# === Config ===
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("cache", "embeddings"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+
+# === Keys ===
+def normalize_text(text: str) -> str:
+    # MiniLM is uncased and ignores whitespace runs, so these all embed the same
+    return ' '.join((text or "").split()).lower()
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest().encode("ascii")
+
+
+# === Store ===
+# One append-only file of fixed-size records (hex key + float32 vector),
+# memory-mapped for reads. Rows are only ever appended with a single write,
+# so several processes can share the file; each one picks up rows the others
+# added the next time it looks something up.
+class EmbeddingCache:
+    def __init__(self, path: str, dimension: int = EMBEDDING_DIM):
+        self.path = path
+        self.dimension = dimension
+        self.dtype = np.dtype([("key", "S32"), ("vec", "<f4", (dimension,))])
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._records = None
+        self._size = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _refresh(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        size -= size % self.dtype.itemsize  # ignore a record still being written
+        if size <= self._size:
+            return
+
+        records = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(size // self.dtype.itemsize,))
+        start = self._size // self.dtype.itemsize
+        for row, key in enumerate(records["key"][start:].tolist(), start):
+            self._rows.setdefault(key, row)
+        self._records = records
+        self._size = size
+
+    def get_many(self, keys) -> dict:
+        with self._lock:
+            self._refresh()
+            rows = {key: self._rows[key] for key in keys if key in self._rows}
+            if not rows:
+                return {}
+            vectors = self._records["vec"][list(rows.values())]
+        return dict(zip(rows.keys(), vectors))
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        with self._lock:
+            self._refresh()
+            fresh = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not fresh:
+                return
+
+            records = np.empty(len(fresh), dtype=self.dtype)
+            records["key"] = [keys[i] for i in fresh]
+            records["vec"] = vectors[fresh]
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(records.tobytes())
+            self._refresh()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache(os.path.join(EMBEDDING_CACHE_DIR, f"{EMBEDDING_MODEL_NAME}.emb"))
+
+
+# === Cached encoding ===
+def _lookup(texts):
+    keys = [text_key(text) for text in texts]
+    found = get_embedding_cache().get_many(set(keys))
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    return keys, found, missing
+
+
+def _assemble(keys, found, missing, vectors):
+    if missing:
+        vectors = np.asarray(vectors, dtype="float32")
+        get_embedding_cache().put_many(list(missing.keys()), vectors)
+        found.update(zip(missing.keys(), vectors))
+    return np.stack([found[key] for key in keys])
+
+
+# Deduplicates `texts`, serves what it can from the cache and sends only
+# unseen texts to `encode` (a callable taking a list of strings and returning
+# one vector per string). Returns a float32 matrix aligned with `texts`.
+def cached_encode(texts, encode) -> np.ndarray:
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype="float32")
+
+    if not EMBEDDING_CACHE_ENABLED:
+        return np.asarray(encode(texts), dtype="float32")
+
+    keys, found, missing = _lookup(texts)
+    vectors = encode(list(missing.values())) if missing else None
+    return _assemble(keys, found, missing, vectors)
+
+
+async def acached_encode(texts, aencode) -> np.ndarray:
+    # Same as cached_encode, for an async `aencode`
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype="float32")
+
+    if not EMBEDDING_CACHE_ENABLED:
+        return np.asarray(await aencode(texts), dtype="float32")
+
+    keys, found, missing = _lookup(texts)
+    vectors = await aencode(list(missing.values())) if missing else None
+    return _assemble(keys, found, missing, vectors)
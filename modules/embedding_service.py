@@ -0,0 +1,128 @@
+# modules/embedding_service.py
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, InvalidStateError
+from functools import lru_cache
+
+import numpy as np
+
+from modules.embedding_cache import EMBEDDING_MODEL_NAME, EMBEDDING_DIM
+
+# === Config ===
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))       # Texts per model.encode call
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))  # How long a request waits for company
+
+
+# === Service ===
+# One SentenceTransformer per process, owned by a single worker thread.
+# Callers from any thread (or event loop) enqueue texts; the worker gathers
+# whatever arrives within EMBED_MAX_WAIT_MS (up to EMBED_MAX_BATCH texts) and
+# encodes it in one call, so concurrent sessions share forward passes instead
+# of queueing up single-vector encodes.
+class EmbeddingService:
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, max_batch: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _ensure_worker(self):
+        # Also restarts a worker that died, so queued requests never hang
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+                    self._worker.start()
+
+    def submit(self, texts) -> Future:
+        future = Future()
+        texts = list(texts)
+        if not texts:
+            future.set_result(np.zeros((0, EMBEDDING_DIM), dtype="float32"))
+            return future
+        self._ensure_worker()
+        self._requests.put((texts, future))
+        return future
+
+    # === Entry points ===
+    def encode(self, texts) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def aencode(self, texts) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    # === Worker ===
+    def _collect(self):
+        batch = [self._requests.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    @staticmethod
+    def _deliver(future, result=None, error=None):
+        # One caller's future must never take the worker down with it
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _run(self):
+        while True:
+            # Requests whose caller gave up (e.g. asyncio.wait_for around
+            # aencode cancelled the future) are dropped before encoding
+            batch = [(texts, future) for texts, future in self._collect()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = np.asarray(
+                    self.model.encode(texts, batch_size=self.max_batch, show_progress_bar=False),
+                    dtype="float32"
+                )
+            except Exception as e:
+                for _, future in batch:
+                    self._deliver(future, error=e)
+                continue
+
+            start = 0
+            for request_texts, future in batch:
+                self._deliver(future, vectors[start:start + len(request_texts)])
+                start += len(request_texts)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    return EmbeddingService()
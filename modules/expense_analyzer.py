@@ -1,30 +1,104 @@
+import os
 import pandas as pd
-import streamlit as st
-import pandas as pd
-import plotly.express as px
+from modules.expense_rules import get_rule_engine
+from modules.trend_forecaster import month_keys, month_labels
+
+# Large statement dumps are read and aggregated chunk by chunk
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "250000"))   # pandas reader
+CSV_BLOCK_MB = float(os.getenv("CSV_BLOCK_MB", "32"))         # pyarrow reader
+TRANSACTION_DATE_FORMAT = os.getenv("TRANSACTION_DATE_FORMAT", "%Y-%m-%d")
+
+# Read as text and converted explicitly, so a stray "₹1,200" deep in a file
+# can't change a column's type halfway through
+TEXT_COLUMNS = ("Date", "Description", "Amount", "Type")
+
+
+def _read_csv_chunks(file, chunk_rows=CSV_CHUNK_ROWS):
+    # pyarrow's multi-threaded streaming reader when installed, pandas' C
+    # reader in chunks otherwise
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pv
+    except ImportError:
+        yield from pd.read_csv(file, chunksize=chunk_rows, dtype={c: str for c in TEXT_COLUMNS})
+        return
+
+    read_options = pv.ReadOptions(block_size=int(CSV_BLOCK_MB * 1024 * 1024))
+    # The streaming reader fixes column types from its first block; open once
+    # for the header and again with every column as text so no later block
+    # can disagree with it
+    columns = pv.open_csv(file, read_options=read_options).schema.names
+    if hasattr(file, "seek"):
+        file.seek(0)
+    reader = pv.open_csv(
+        file,
+        read_options=read_options,
+        # Empty and "NA"-style cells become nulls, as they would be NaN in pandas
+        convert_options=pv.ConvertOptions(column_types={c: pa.string() for c in columns}, strings_can_be_null=True)
+    )
+    for batch in reader:
+        yield _convert_arrow_batch(pa.Table.from_batches([batch])).to_pandas()
+
+
+def _convert_arrow_batch(table):
+    # Fast path in Arrow's compute kernels; a column that doesn't convert
+    # cleanly (currency symbols, other date formats) stays text and goes
+    # through parse_amounts / parse_dates instead
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    conversions = {
+        "Date": lambda column: pc.strptime(column, format=TRANSACTION_DATE_FORMAT, unit="us"),
+        "Amount": lambda column: pc.cast(column, pa.float64()),
+    }
+    for name, convert in conversions.items():
+        index = table.schema.get_field_index(name)
+        if index < 0:
+            continue
+        try:
+            table = table.set_column(index, name, convert(table.column(index)))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return table
+
+
+def parse_amounts(values):
+    # Plain signed numbers convert directly; only files with currency symbols
+    # or thousands separators pay for the regex clean-up
+    if pd.api.types.is_float_dtype(values):
+        return values
+    try:
+        return pd.to_numeric(values).astype(float)
+    except (ValueError, TypeError):
+        return values.replace('[₹,+]', '', regex=True).astype(float)
+
+
+def parse_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format=TRANSACTION_DATE_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values)
+
+
+def iter_transactions(file, chunk_rows=CSV_CHUNK_ROWS):
+    for df in _read_csv_chunks(file, chunk_rows):
+        df['Date'] = parse_dates(df['Date'])
+        df['Amount'] = parse_amounts(df['Amount'])
+        yield df
+
 
 def load_transactions(file):
-    df = pd.read_csv(file)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Amount'] = df['Amount'].replace('[₹,+]', '', regex=True).astype(float)
-    return df
+    chunks = list(iter_transactions(file))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
 
 def categorize_expenses(df):
-    def get_category(desc):
-        desc = desc.lower()
-        if 'amazon' in desc or 'flipkart' in desc:
-            return 'Shopping'
-        elif 'swiggy' in desc or 'zomato' in desc:
-            return 'Food'
-        elif 'salary' in desc or 'freelance' in desc:
-            return 'Income'
-        elif 'electricity' in desc or 'bill' in desc:
-            return 'Utilities'
-        elif 'movie' in desc:
-            return 'Entertainment'
-        else:
-            return 'Others'
-    df['Category'] = df['Description'].apply(get_category)
+    # Rules come from modules/expense_rules.py (or EXPENSE_RULES_PATH) and are
+    # applied column-wise over the distinct descriptions
+    df['Category'] = get_rule_engine().categorize(df['Description'])
     return df
 
 def get_summary(df):
@@ -33,4 +107,58 @@ def get_summary(df):
     return summary
 
 
+# === Out-of-core summaries ===
+# Running per-category and per-month/category expense totals, fed one
+# categorised chunk at a time, so a file of any size is summarised in the
+# memory of a single chunk.
+class TransactionSummary:
+    def __init__(self, preview_rows=1000):
+        self.rows = 0
+        self.preview_rows = preview_rows
+        self.preview = None
+        self._by_category = None
+        self._by_month = None
+
+    @staticmethod
+    def _add(total, partial):
+        return partial if total is None else total.add(partial, fill_value=0)
+
+    def add(self, df):
+        self.rows += len(df)
+        if self.preview is None:
+            self.preview = df.head(self.preview_rows)
 
+        expense_df = df[df['Amount'] < 0]
+        self._by_category = self._add(self._by_category, expense_df.groupby('Category')['Amount'].sum())
+        self._by_month = self._add(
+            self._by_month,
+            expense_df.groupby([month_keys(expense_df['Date']), 'Category'])['Amount'].sum()
+        )
+
+    def track(self, chunks):
+        # Passes chunks through unchanged while adding them, so the summary
+        # can ride along with another consumer of the same stream
+        for df in chunks:
+            self.add(df)
+            yield df
+
+    def category_totals(self):
+        # Same shape as get_summary(df) over the whole file
+        if self._by_category is None:
+            return pd.Series(dtype=float, name='Amount', index=pd.Index([], name='Category'))
+        return self._by_category.abs().sort_values(ascending=False).rename('Amount')
+
+    def monthly_totals(self):
+        # Month ("YYYY-MM"), Category, Amount (expenses as positive numbers)
+        if self._by_month is None:
+            return pd.DataFrame(columns=['Month', 'Category', 'Amount'])
+        monthly = self._by_month.abs().reset_index().sort_values(['MonthKey', 'Category'])
+        monthly.insert(0, 'Month', month_labels(monthly.pop('MonthKey')))
+        return monthly.reset_index(drop=True)
+
+
+def summarize_transactions(file, chunk_rows=CSV_CHUNK_ROWS):
+    summary = TransactionSummary()
+    for df in iter_transactions(file, chunk_rows):
+        summary.add(categorize_expenses(df))
+    return summary
@@ -0,0 +1,186 @@
+# modules/expense_cube.py
+
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from modules.trend_forecaster import month_keys, month_labels
+
+# === Config ===
+# Persistent history of every transaction file uploaded, pre-aggregated to
+# month x category x sign. New files are merged in incrementally; rows that
+# were already merged (same transaction key) are skipped.
+EXPENSE_CUBE_DIR = os.getenv("EXPENSE_CUBE_DIR", os.path.join("data", "expense_cube"))
+# Columns identifying a transaction; a bank reference/ID column is best.
+# Identical rows within a file are told apart by their order of occurrence.
+TRANSACTION_KEY_COLUMNS = [c.strip() for c in os.getenv("TRANSACTION_KEY_COLUMNS", "Date,Description,Amount").split(",")]
+
+EXPENSE, INCOME = -1, 1
+
+def _empty_cube():
+    return pd.DataFrame({
+        "MonthKey": pd.Series(dtype=np.int64),
+        "Category": pd.Series(dtype=str),
+        "Sign": pd.Series(dtype=np.int8),
+        "Amount": pd.Series(dtype=float),
+        "Count": pd.Series(dtype=np.int64),
+    })
+
+
+def _contains(sorted_values, values):
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    position = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[position] == values
+
+
+class OccurrenceCounter:
+    # Running count of each row hash seen so far in one file, kept as sorted
+    # numpy arrays so chunks of millions of rows stay vectorised
+    def __init__(self):
+        self.hashes = np.array([], dtype=np.uint64)
+        self.counts = np.array([], dtype=np.int64)
+
+    def take(self, hashes):
+        # Occurrence number of every row: identical rows before it in this
+        # chunk plus those in earlier chunks. One stable sort groups equal
+        # hashes in file order.
+        order = np.argsort(hashes, kind="stable")
+        ordered = hashes[order]
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        run_lengths = np.diff(np.r_[starts, len(ordered)])
+        unique = ordered[starts]
+        seen = _contains(self.hashes, unique)
+        prior = np.zeros(len(unique), dtype=np.int64)
+        prior[seen] = self.counts[np.searchsorted(self.hashes, unique[seen])]
+
+        occurrence = np.empty(len(hashes), dtype=np.int64)
+        occurrence[order] = np.arange(len(ordered)) - np.repeat(starts - prior, run_lengths)
+
+        # Fold this chunk's counts in, keeping the arrays sorted
+        if seen.any():
+            self.counts[np.searchsorted(self.hashes, unique[seen])] += run_lengths[seen]
+        new = ~seen
+        position = np.searchsorted(self.hashes, unique[new])
+        self.hashes = np.insert(self.hashes, position, unique[new])
+        self.counts = np.insert(self.counts, position, run_lengths[new])
+        return occurrence
+
+
+def transaction_keys(df, occurrences: OccurrenceCounter = None):
+    # 64-bit key per row: hash of the key columns plus how many identical rows
+    # came before it in the same file (across chunks when given a counter)
+    columns = [c for c in TRANSACTION_KEY_COLUMNS if c in df]
+    hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    occurrence = (occurrences or OccurrenceCounter()).take(hashes)
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({"hash": hashes, "occurrence": occurrence}), index=False
+    ).to_numpy()
+
+
+# === Cube ===
+# cube.parquet: MonthKey (year*100+month), Category, Sign (-1 expense,
+# +1 income), Amount (sum), Count (transactions); keys.parquet: the sorted
+# transaction keys already merged. Both are rewritten (temp file + rename)
+# after each appended file.
+class ExpenseCube:
+    def __init__(self, cube_dir: str = EXPENSE_CUBE_DIR):
+        self.cube_dir = cube_dir
+        self.cube_path = os.path.join(cube_dir, "cube.parquet")
+        self.keys_path = os.path.join(cube_dir, "keys.parquet")
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped by clear(), so callers can tell their merges are gone
+        self.cube, self.keys = self._read()
+
+    def _read(self):
+        if not (os.path.exists(self.cube_path) and os.path.exists(self.keys_path)):
+            return _empty_cube(), np.array([], dtype=np.uint64)
+        cube = pd.read_parquet(self.cube_path)
+        keys = pd.read_parquet(self.keys_path)["key"].to_numpy(dtype=np.uint64)
+        return cube, keys
+
+    def _write(self, cube, keys):
+        os.makedirs(self.cube_dir, exist_ok=True)
+        cube.to_parquet(self.cube_path + ".tmp", index=False)
+        pd.DataFrame({"key": keys}).to_parquet(self.keys_path + ".tmp", index=False)
+        # Cube first: a crash in between leaves keys that are missing rows the
+        # cube counts, never keys that make a re-upload skip rows it lacks
+        os.replace(self.cube_path + ".tmp", self.cube_path)
+        os.replace(self.keys_path + ".tmp", self.keys_path)
+
+    @staticmethod
+    def _aggregate(df):
+        sign = np.where(df["Amount"] < 0, EXPENSE, INCOME).astype(np.int8)
+        grouped = df.groupby([month_keys(df["Date"]), df["Category"], pd.Series(sign, index=df.index, name="Sign")])
+        return grouped["Amount"].agg(Amount="sum", Count="size").reset_index()
+
+    def append(self, chunks):
+        # Merges categorised transaction chunks (one file) into the cube.
+        # Returns (rows added, duplicate rows skipped).
+        with self._lock:
+            occurrences = OccurrenceCounter()
+            partials, new_keys = [], []
+            added = skipped = 0
+
+            for df in chunks:
+                keys = transaction_keys(df, occurrences)
+                duplicate = _contains(self.keys, keys)
+                fresh = df[~duplicate]
+                skipped += int(duplicate.sum())
+                added += len(fresh)
+                if len(fresh):
+                    partials.append(self._aggregate(fresh))
+                    new_keys.append(keys[~duplicate])
+
+            if not partials:
+                return added, skipped
+
+            merged = pd.concat([self.cube] + partials, ignore_index=True) if len(self.cube) else pd.concat(partials)
+            cube = merged.groupby(["MonthKey", "Category", "Sign"], as_index=False)[["Amount", "Count"]].sum()
+            keys = np.sort(np.concatenate([self.keys] + new_keys))
+            self._write(cube, keys)
+            self.cube, self.keys = cube, keys
+            return added, skipped
+
+    def clear(self):
+        with self._lock:
+            for path in (self.cube_path, self.keys_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.cube, self.keys = self._read()
+            self.generation += 1
+
+    @property
+    def transactions(self) -> int:
+        return int(self.cube["Count"].sum()) if len(self.cube) else 0
+
+    # === Reads ===
+    def category_totals(self):
+        # Same shape as expense_analyzer.get_summary over all merged history
+        expenses = self.cube[self.cube["Sign"] == EXPENSE]
+        summary = expenses.groupby("Category")["Amount"].sum().abs().sort_values(ascending=False)
+        return summary.rename("Amount")
+
+    def monthly_totals(self):
+        # Month ("YYYY-MM"), Category, Amount (expenses as positive numbers),
+        # ready for trend_forecaster.forecast_monthly_totals
+        expenses = self.cube[self.cube["Sign"] == EXPENSE]
+        monthly = expenses.groupby(["MonthKey", "Category"])["Amount"].sum().abs().reset_index()
+        monthly.insert(0, "Month", month_labels(monthly.pop("MonthKey")))
+        return monthly
+
+
+def cube_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_expense_cube() -> ExpenseCube:
+    return ExpenseCube()
@@ -0,0 +1,100 @@
+# modules/expense_rules.py
+
+import os
+import re
+import json
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# === Config ===
+# EXPENSE_RULES_PATH may point at a JSON list of rules replacing the defaults:
+#   [{"category": "Food", "keywords": ["swiggy", "zomato"], "patterns": ["\\bcafe\\b"]}, ...]
+# Keywords match anywhere in the lowercased description, patterns are regexes
+# searched in it (keep them to the RE2 subset: no lookarounds or backrefs).
+# Rules are tried in order and the first match wins.
+EXPENSE_RULES_PATH = os.getenv("EXPENSE_RULES_PATH")
+DEFAULT_CATEGORY = "Others"
+
+DEFAULT_RULES = [
+    {"category": "Shopping", "keywords": ["amazon", "flipkart"]},
+    {"category": "Food", "keywords": ["swiggy", "zomato"]},
+    {"category": "Income", "keywords": ["salary", "freelance"]},
+    {"category": "Utilities", "keywords": ["electricity", "bill"]},
+    {"category": "Entertainment", "keywords": ["movie"]},
+]
+
+
+def load_rules(path: str = None) -> list:
+    path = path or EXPENSE_RULES_PATH
+    if not path:
+        return DEFAULT_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# === Engine ===
+# Categorisation works on the distinct descriptions only (bank exports repeat
+# the same merchants over and over): every rule is evaluated column-wise over
+# them, np.select picks the first matching rule per description, and the
+# result is mapped back onto every row. With pyarrow installed the matching
+# runs in Arrow's vectorised string kernels (keywords as plain substrings,
+# patterns as RE2 regexes); otherwise each rule is one combined Python regex
+# applied with pandas' str.contains.
+class RuleEngine:
+    def __init__(self, rules: list, default: str = DEFAULT_CATEGORY):
+        if not rules:
+            raise ValueError("No expense rules configured")
+        self.categories = [rule["category"] for rule in rules]
+        self.default = default
+        self.keywords = [[keyword.lower() for keyword in rule.get("keywords", ())] for rule in rules]
+        self.regexes = [list(rule.get("patterns", ())) for rule in rules]
+        for rule, keywords, regexes in zip(rules, self.keywords, self.regexes):
+            if not keywords and not regexes:
+                raise ValueError(f"Expense rule for {rule['category']!r} has no keywords or patterns")
+        self.patterns = [
+            re.compile("|".join([re.escape(k) for k in keywords] + [f"(?:{r})" for r in regexes]))
+            for keywords, regexes in zip(self.keywords, self.regexes)
+        ]
+
+    def _arrow_conditions(self, lowered: list) -> list:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        values = pa.array(lowered, type=pa.string())
+        conditions = []
+        for keywords, regexes in zip(self.keywords, self.regexes):
+            masks = [pc.match_substring(values, keyword) for keyword in keywords]
+            masks += [pc.match_substring_regex(values, regex) for regex in regexes]
+            mask = masks[0]
+            for other in masks[1:]:
+                mask = pc.or_(mask, other)
+            conditions.append(mask.to_numpy(zero_copy_only=False))
+        return conditions
+
+    def _pandas_conditions(self, lowered: list) -> list:
+        values = pd.Series(lowered, dtype=object)
+        return [values.str.contains(pattern, regex=True).to_numpy(dtype=bool) for pattern in self.patterns]
+
+    def categorize(self, descriptions: pd.Series) -> pd.Series:
+        codes, uniques = pd.factorize(descriptions)
+        lowered = [str(value).lower() for value in uniques.tolist()]
+
+        try:
+            conditions = self._arrow_conditions(lowered)
+        except ImportError:
+            conditions = self._pandas_conditions(lowered)
+        rule_index = np.select(conditions, np.arange(len(self.categories)), default=len(self.categories))
+
+        # Taking from a small labels array keeps pandas' default string dtype
+        # without re-inferring it over every row
+        labels = pd.Series(self.categories + [self.default]).array
+        # Missing descriptions factorize to -1, which picks the appended default
+        rule_index = np.append(rule_index, len(self.categories))
+        return pd.Series(labels.take(rule_index[codes]), index=descriptions.index, name="Category")
+
+
+@lru_cache(maxsize=None)
+def get_rule_engine(path: str = None) -> RuleEngine:
+    return RuleEngine(load_rules(path))
@@ -0,0 +1,199 @@
+# modules/ingestion.py
+
+import os
+import heapq
+import queue
+import threading
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+from modules.pdf_processor import iter_pdf_chunks, iter_routed_chunks, page_fingerprints
+from modules.pinecone_handler import upload_embeddings_to_pinecone, chunk_text, chunk_metadata
+from modules.bm25_index import BM25Builder, bm25_index_exists
+from modules.chunk_cache import load_cached_chunks, iter_and_cache
+from modules.document_registry import get_document_registry, assign_chunk_ids
+from modules.upsert_manifest import UpsertManifest
+from modules.vector_store import VECTOR_STORE, get_vector_store
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Chunks per encode/upsert batch
+PREFETCH_CHUNKS = int(os.getenv("PREFETCH_CHUNKS", "256"))   # Extracted chunks buffered ahead of embedding
+
+_DONE = object()
+
+
+# === Stage decoupling ===
+# Runs `items` in a background thread and hands results over through a bounded
+# queue, so extraction keeps going while the consumer embeds. When the queue
+# is full the producer blocks: that is the backpressure between the stages.
+def prefetch(items: Iterable, depth: int = PREFETCH_CHUNKS) -> Iterator:
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            for item in items:
+                while not stop.is_set():
+                    try:
+                        buffer.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.put(_DONE)
+
+    worker = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        # Drain so a producer blocked on put() can see the stop flag and exit
+        while worker.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        worker.join()
+
+    if errors:
+        raise errors[0]
+
+
+# === Pipeline ===
+def _index_lexically(file_hash: str, chunks: Iterable[dict], builder: BM25Builder) -> Iterator[dict]:
+    # Feeds every chunk to the BM25 builder on the way through. Chunks without a
+    # content id (documents indexed before the registry) keep the positional id.
+    for i, chunk in enumerate(chunks):
+        chunk.setdefault("id", f"{file_hash}_{i}")
+        text = chunk_text(chunk)
+        builder.add(chunk["id"], text, chunk_metadata(chunk, text))
+        yield chunk
+
+
+def _has_content(chunk: dict) -> bool:
+    return bool(chunk.get("text") or chunk.get("table_text"))
+
+
+def _content_chunks(file_path: str, file_hash: str) -> Iterator[dict]:
+    return (c for c in iter_pdf_chunks(file_path, file_hash) if _has_content(c))
+
+
+# === Incremental re-indexing ===
+def _reusable_pages(previous: dict, fingerprints: list) -> dict:
+    # New page index (0-based) -> page number in the previous version with the
+    # same fingerprint, i.e. pages whose chunks can be taken over unextracted
+    old_pages = {}
+    for n, fingerprint in enumerate(previous["fingerprints"]):
+        old_pages.setdefault(fingerprint, n + 1)
+    return {n: old_pages[fp] for n, fp in enumerate(fingerprints) if fp in old_pages}
+
+
+def _reused_chunks(old_chunks: list, reuse: dict, filename: str) -> Iterator[dict]:
+    by_page = defaultdict(list)
+    for chunk in old_chunks:
+        by_page[chunk.get("page_number")].append(chunk)
+
+    for n in sorted(reuse):
+        for chunk in by_page.get(reuse[n], ()):
+            chunk = dict(chunk, page_number=n + 1, source=filename)
+            chunk.pop("id", None)
+            yield chunk
+
+
+def _version_chunks(file_path: str, file_hash: str, previous: dict, fingerprints: list) -> Iterator[dict]:
+    # Chunks of the new version: unchanged pages from the previous version's
+    # chunk cache, changed pages freshly extracted, merged in page order and
+    # cached under the new hash. Without the old cache every page is extracted.
+    filename = os.path.basename(file_path)
+    cached = load_cached_chunks(file_hash)
+    if cached is not None:
+        # Resuming an interrupted re-index: this version is already extracted
+        return (c for c in cached if _has_content(c))
+
+    old_chunks = load_cached_chunks(previous["file_hash"])
+    reuse = _reusable_pages(previous, fingerprints) if old_chunks is not None else {}
+    changed = [n for n in range(len(fingerprints)) if n not in reuse]
+    print(f"♻️ {filename}: {len(changed)} of {len(fingerprints)} pages changed since the last version")
+
+    chunks = heapq.merge(
+        _reused_chunks(old_chunks or [], reuse, filename),
+        iter_routed_chunks(file_path, filename, page_numbers=changed),
+        key=lambda chunk: chunk["page_number"]
+    )
+    return (c for c in iter_and_cache(file_hash, chunks) if _has_content(c))
+
+
+# extract (background thread) -> embed (fixed-size batches) -> upsert (thread pool),
+# with the document's BM25 index built alongside and saved once all vectors are in.
+# `document_id` names the document across versions (default: the file name).
+# An upload registered under the same id that shares most of its pages with an
+# indexed document is a new version of it and goes into that document's
+# namespace: only chunks whose content id is new are embedded and upserted, and
+# ids the new version no longer has are deleted. Anything else is indexed as a
+# document of its own. Returns the number of chunks indexed for this version.
+def ingest_pdf(file_path: str, file_hash: str, batch_size: int = EMBED_BATCH_SIZE, document_id: str = None) -> int:
+    registry = get_document_registry()
+    filename = os.path.basename(file_path)
+    document_id = document_id or filename
+    fingerprints = page_fingerprints(file_path)
+    previous = registry.previous_version(document_id, file_hash, fingerprints)
+
+    if previous is None:
+        namespace = registry.new_namespace(file_hash)
+        old_ids = set()
+        chunks = _content_chunks(file_path, file_hash)
+    else:
+        namespace = previous["namespace"]
+        old_ids = set(previous["ids"])
+        chunks = _version_chunks(file_path, file_hash, previous, fingerprints)
+
+    builder = BM25Builder()
+    chunks = _index_lexically(file_hash, assign_chunk_ids(chunks), builder)
+    new_chunks = (c for c in chunks if c["id"] not in old_ids)
+
+    # Picks up where an interrupted run of the same ingest left off
+    manifest = UpsertManifest(file_hash, VECTOR_STORE, batch_size=batch_size)
+    count = upload_embeddings_to_pinecone(file_hash, prefetch(new_chunks), batch_size=batch_size,
+                                          manifest=manifest, namespace=namespace)
+    builder.build().save(file_hash)
+    if not manifest.complete:
+        return count
+
+    if previous is not None:
+        stale = old_ids.difference(builder.ids)
+        try:
+            # Sent in batches by the backend; any failed batch raises
+            get_vector_store().delete(sorted(stale), namespace=namespace)
+        except Exception as e:
+            # Leave the registry on the old version until every stale id is
+            # gone, so the next upload retries
+            print(f"[ERROR] Failed to delete stale vectors for {filename}: {e}")
+            manifest.discard()
+            return count
+        UpsertManifest(previous["file_hash"], VECTOR_STORE).discard()
+        print(f"♻️ {filename}: {count} vectors upserted, {len(stale)} deleted")
+    registry.record(document_id, file_hash, namespace, fingerprints, builder.ids, previous=previous)
+    return len(builder.ids)
+
+
+def ensure_lexical_index(file_path: str, file_hash: str):
+    # For documents embedded before BM25 indexes existed: rebuild from the
+    # chunk cache (or a fresh extraction) without touching the vectors
+    if bm25_index_exists(file_hash):
+        return
+    chunks = _content_chunks(file_path, file_hash)
+    if get_document_registry().has_content_ids(file_hash):
+        chunks = assign_chunk_ids(chunks)
+    builder = BM25Builder()
+    for _ in _index_lexically(file_hash, chunks, builder):
+        pass
+    builder.build().save(file_hash)
@@ -0,0 +1,172 @@
+# modules/llm_client.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# === Config ===
+# GROQ_BASE_URL can point at any OpenAI-compatible server (e.g. a local stub)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))          # Whole-request deadline, retries included
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # In-flight requests per process
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+RETRY_BASE_DELAY_S = 0.5
+RETRY_MAX_DELAY_S = 8.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def require_api_key() -> str:
+    # Read at call time so a .env loaded after import is still picked up
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError(" GROQ_API_KEY not found. Make sure .env file is correct and 'python-dotenv' is installed.")
+    return api_key
+
+
+class LLMError(Exception):
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+# === Client ===
+# One pooled HTTP session for every LLM call in the process (PDF Q&A and the
+# chatbot), so TLS connections are reused. Each call has an overall deadline,
+# 429/5xx and connection errors are retried with jittered exponential
+# backoff (honouring Retry-After), and a process-wide semaphore caps how many
+# requests are in flight at once.
+class LLMClient:
+    def __init__(self, base_url: str = GROQ_BASE_URL, api_key: str = None,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 timeout: float = LLM_TIMEOUT_S):
+        self.base_url = base_url.rstrip("/")
+        self._api_key = api_key
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=LLM_POOL_SIZE, pool_maxsize=LLM_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def api_key(self):
+        return self._api_key or require_api_key()
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), RETRY_MAX_DELAY_S)
+            except ValueError:
+                pass
+        # Full jitter: spreads retries from concurrent sessions apart
+        return random.uniform(0, min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * 2 ** attempt))
+
+    def _post(self, payload, stream, deadline):
+        # Returns a 200 response; retries what is retryable until the deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMError("LLM request deadline exceeded")
+
+            response = None
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self._headers(),
+                    json=payload,
+                    stream=stream,
+                    timeout=(min(LLM_CONNECT_TIMEOUT_S, remaining), remaining)
+                )
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    body = response.text
+                    response.close()  # hand the connection back to the pool
+                    raise LLMError(f"LLM API status {response.status_code}",
+                                   status_code=response.status_code, body=body)
+                response.close()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise LLMError(f"LLM request failed: {e}") from e
+
+            delay = self._backoff(attempt, response)
+            if time.monotonic() + delay >= deadline:
+                raise LLMError("LLM request deadline exceeded")
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _payload(messages, model, temperature, stream):
+        payload = {"model": model, "messages": messages, "stream": stream}
+        if temperature is not None:
+            payload["temperature"] = temperature
+        return payload
+
+    def _acquire(self, deadline):
+        # Waiting for a free slot counts against the request's deadline too
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise LLMError("LLM request deadline exceeded waiting for a free slot")
+
+    # === Sync ===
+    def chat(self, messages, model, temperature=None, timeout=None) -> str:
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._acquire(deadline)
+        try:
+            response = self._post(self._payload(messages, model, temperature, False), False, deadline)
+            with response:
+                return response.json()["choices"][0]["message"]["content"]
+        finally:
+            self._slots.release()
+
+    def stream_chat(self, messages, model, temperature=None, timeout=None):
+        # Generator of content deltas parsed from server-sent events; the
+        # concurrency slot is held until the stream ends, fails or is
+        # abandoned (closing or collecting the generator runs the finally)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._acquire(deadline)
+        try:
+            response = self._post(self._payload(messages, model, temperature, True), True, deadline)
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if time.monotonic() > deadline:
+                        raise LLMError("LLM stream deadline exceeded")
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        finally:
+            self._slots.release()
+
+    # === Async ===
+    # The blocking calls run on worker threads, so an event loop can fan out
+    # many requests while the semaphore still bounds them.
+    async def achat(self, messages, model, temperature=None, timeout=None) -> str:
+        return await asyncio.to_thread(self.chat, messages, model, temperature, timeout)
+
+
+@lru_cache(maxsize=None)
+def get_llm_client() -> LLMClient:
+    return LLMClient()
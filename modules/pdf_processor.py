@@ -4,14 +4,38 @@ import pdfplumber
 import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image
-import io
 import os
 import hashlib
-from concurrent.futures import ThreadPoolExecutor
+import heapq
+from collections import deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from modules.chunk_cache import load_cached_chunks, iter_and_cache
 
 
 DEBUG = False  # Set True to see logs
 
+# Page-parallel extraction: PDF_WORKERS=1 keeps everything in-process. For a
+# document routed to both extractors, PDF_WORKERS is the process budget for
+# the whole document and is split between them (see iter_routed_chunks).
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_SHARD = int(os.getenv("PDF_PAGES_PER_SHARD", "8"))
+
+# OCR: process count and adaptive render resolution
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_TARGET_MEGAPIXELS = float(os.getenv("OCR_TARGET_MEGAPIXELS", "4"))  # ~200 DPI on A4/Letter
+OCR_MIN_DPI = 100
+OCR_MAX_DPI = 300
+
+# Per-page routing between pdfplumber and OCR
+PAGE_TEXT, PAGE_OCR, PAGE_EMPTY = "text", "ocr", "empty"
+MIN_TEXT_CHARS = int(os.getenv("MIN_TEXT_CHARS", "20"))           # Text layer long enough to trust
+MIN_IMAGE_COVERAGE = float(os.getenv("MIN_IMAGE_COVERAGE", "0.1"))  # Image share of page area that needs OCR
+
+# Spawn rather than fork: the app process already runs threads and may hold a
+# loaded torch model, neither of which is fork-safe.
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
 
 def get_file_hash(file_path: str):
     with open(file_path, "rb") as f:
@@ -26,41 +50,63 @@ def clean_text(text):
     return ' '.join(text.replace('\n', ' ').split())
 
 
-def convert_pdf_page_to_image(pdf_path, page_number, dpi=200):
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(page_number)
-    pix = page.get_pixmap(dpi=dpi)
-    img_bytes = pix.tobytes("png")
-    return Image.open(io.BytesIO(img_bytes))
+def page_ocr_dpi(page):
+    # Scale DPI so every page renders to roughly OCR_TARGET_MEGAPIXELS: small
+    # pages get more detail, oversized pages don't explode render/OCR time.
+    width_in, height_in = page.rect.width / 72, page.rect.height / 72
+    area = max(width_in * height_in, 1e-6)
+    dpi = (OCR_TARGET_MEGAPIXELS * 1_000_000 / area) ** 0.5
+    return int(max(OCR_MIN_DPI, min(OCR_MAX_DPI, dpi)))
 
 
-def ocr_page_image(args):
-    pdf_path, page_number = args
-    image = convert_pdf_page_to_image(pdf_path, page_number)
-    text = pytesseract.image_to_string(image)
+def render_page_image(page, dpi=None):
+    # Render straight to an 8-bit grayscale pixel buffer (no PNG encode/decode)
+    dpi = dpi or page_ocr_dpi(page)
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def convert_pdf_page_to_image(pdf_path, page_number, dpi=None):
+    with fitz.open(pdf_path) as doc:
+        return render_page_image(doc.load_page(page_number), dpi)
+
+
+def ocr_image_chunks(image, page_number, source):
+    # One Tesseract pass: word-level data, with the page text rebuilt from the
+    # same words line by line instead of a second image_to_string call.
     data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
 
+    words = []
+    lines = []
+    current_line = None
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word:
+            continue
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if line_key != current_line:
+            lines.append([])
+            current_line = line_key
+        lines[-1].append(word)
+        words.append(word)
+
     chunks = []
-    if text.strip():
+    text = clean_text('\n'.join(' '.join(line) for line in lines))
+    if text:
         chunks.append({
             "type": "ocr_text",
-            "source": os.path.basename(pdf_path),
+            "source": source,
             "page_number": page_number + 1,
-            "text": clean_text(text)
+            "text": text
         })
 
     # Extract row-like table text from OCR
-    rows = []
-    for i in range(len(data['text'])):
-        word = data['text'][i]
-        if word.strip():
-            rows.append(word)
-
-    if rows:
-        table_text = ' | '.join(rows)
+    if words:
+        table_text = ' | '.join(words)
         chunks.append({
             "type": "table",
-            "source": os.path.basename(pdf_path),
+            "source": source,
             "page_number": page_number + 1,
             "row_index": 0,
             "text": "",
@@ -70,71 +116,255 @@ def ocr_page_image(args):
     return chunks
 
 
-def extract_text_and_tables_from_text_pdf(file_path, filename):
+def ocr_document_page(doc, page_number, source):
+    return ocr_image_chunks(render_page_image(doc.load_page(page_number)), page_number, source)
+
+
+def ocr_page_image(args):
+    pdf_path, page_number = args
+    with fitz.open(pdf_path) as doc:
+        return ocr_document_page(doc, page_number, os.path.basename(pdf_path))
+
+
+# === OCR worker process state ===
+# Each pool worker opens the document once in its initializer and keeps the
+# handle for every page it is given.
+_OCR_DOC = None
+_OCR_SOURCE = None
+
+
+def _init_ocr_worker(pdf_path, source):
+    global _OCR_DOC, _OCR_SOURCE
+    # One Tesseract thread per process; the pool already fills every core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    _OCR_DOC = fitz.open(pdf_path)
+    _OCR_SOURCE = source
+
+
+def _ocr_worker_page(page_number):
+    return ocr_document_page(_OCR_DOC, page_number, _OCR_SOURCE)
+
+
+def text_page_chunks(page, page_num, filename):
+    # extract_text() is the expensive call, so run it once and reuse the result
+    # for both the text-based check and the text chunk itself.
+    raw_text = page.extract_text()
+    if not raw_text:
+        return []
+
     chunks = []
-    with pdfplumber.open(file_path) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
-            if is_text_based_page(page):
-                text = clean_text(page.extract_text() or "")
-                if text:
+    text = clean_text(raw_text)
+    if text:
+        chunks.append({
+            "type": "text",
+            "source": filename,
+            "page_number": page_num,
+            "text": text
+        })
+
+    tables = page.extract_tables()
+    if tables:
+        for table_index, table in enumerate(tables):
+            for row_index, row in enumerate(table):
+                if row and any(cell and cell.strip() for cell in row):
+                    row_text = clean_text(' | '.join(cell.strip() if cell else '' for cell in row))
                     chunks.append({
-                        "type": "text",
+                        "type": "table",
                         "source": filename,
                         "page_number": page_num,
-                        "text": text
+                        "row_index": row_index,
+                        "text": "",
+                        "table_text": row_text
                     })
-
-                tables = page.extract_tables()
-                if tables:
-                    for table_index, table in enumerate(tables):
-                        for row_index, row in enumerate(table):
-                            if row and any(cell and cell.strip() for cell in row):
-                                row_text = clean_text(' | '.join(cell.strip() if cell else '' for cell in row))
-                                chunks.append({
-                                    "type": "table",
-                                    "source": filename,
-                                    "page_number": page_num,
-                                    "row_index": row_index,
-                                    "text": "",
-                                    "table_text": row_text
-                                })
     return chunks
 
 
-def extract_text_and_tables_from_scanned_pdf(file_path, filename):
+def extract_text_page_range(args):
+    # Process-pool worker: opens its own pdfplumber handle for the given
+    # 0-based page numbers
+    file_path, filename, page_numbers = args
     chunks = []
-    doc = fitz.open(file_path)
-    page_numbers = list(range(len(doc)))
+    with pdfplumber.open(file_path, pages=[n + 1 for n in page_numbers]) as pdf:
+        for page_number, page in zip(page_numbers, pdf.pages):
+            chunks.extend(text_page_chunks(page, page_number + 1, filename))
+            # pdfplumber caches parsed objects on each page; drop them as we go
+            page.flush_cache()
+    return chunks
 
-    with ThreadPoolExecutor() as executor:
-        results = list(executor.map(ocr_page_image, [(file_path, p) for p in page_numbers]))
 
-    for page_chunks in results:
-        chunks.extend(page_chunks)
+def get_page_count(file_path):
+    with fitz.open(file_path) as doc:
+        return len(doc)
 
-    return chunks
+
+def page_shards(page_numbers, pages_per_shard=PAGES_PER_SHARD):
+    page_numbers = list(page_numbers)
+    return [page_numbers[start:start + pages_per_shard]
+            for start in range(0, len(page_numbers), pages_per_shard)]
+
+
+def iter_ordered_results(executor, fn, jobs, window):
+    # Submit jobs with at most `window` in flight and yield results in job order
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(fn, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
 
-def process_pdf(file_path: str):
+# === Per-page routing ===
+def classify_page(page):
+    # Cheap PyMuPDF probe: pages with a real text layer go to pdfplumber, pages
+    # that are mostly image (scans) go to OCR, and blank pages are skipped.
+    if len(page.get_text("text").strip()) >= MIN_TEXT_CHARS:
+        return PAGE_TEXT
+
+    page_area = abs(page.rect) or 1.0
+    image_area = 0.0
+    for info in page.get_image_info():
+        image_area += abs(fitz.Rect(info["bbox"]) & page.rect)
+    if image_area / page_area >= MIN_IMAGE_COVERAGE:
+        return PAGE_OCR
+
+    # Outlined (vector-drawn) text has neither a text layer nor images
+    if page.get_drawings():
+        return PAGE_OCR
+    return PAGE_EMPTY
+
+
+def classify_pages(file_path):
+    with fitz.open(file_path) as doc:
+        return [classify_page(page) for page in doc]
+
+
+def fingerprint_page(doc, page):
+    # Hash of what the page draws: its content streams, the raw data of every
+    # image it places, and its size. Unchanged pages hash the same across
+    # versions of a document even when other pages (or the file hash) change.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(tuple(page.rect)).encode())
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+def page_fingerprints(file_path):
+    with fitz.open(file_path) as doc:
+        return [fingerprint_page(doc, page) for page in doc]
+
+
+def iter_text_pdf_chunks(file_path, filename, workers=None, page_numbers=None):
+    # Yields chunks page by page so callers never need the whole document in memory.
+    # With more than one worker, page ranges are sharded across a process pool and
+    # merged back in page order.
+    workers = workers or PDF_WORKERS
+    if page_numbers is None:
+        page_numbers = range(get_page_count(file_path))
+    shards = page_shards(page_numbers)
+    jobs = [(file_path, filename, shard) for shard in shards]
+
+    if workers <= 1 or len(shards) <= 1:
+        for job in jobs:
+            yield from extract_text_page_range(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=_MP_CONTEXT) as executor:
+        for shard_chunks in iter_ordered_results(executor, extract_text_page_range, jobs, workers * 2):
+            yield from shard_chunks
+
+
+def extract_text_and_tables_from_text_pdf(file_path, filename, workers=None):
+    return list(iter_text_pdf_chunks(file_path, filename, workers))
+
+
+def iter_scanned_pdf_chunks(file_path, filename, workers=None, page_numbers=None):
+    # OCR pages on a process pool sized to the machine, yielding in page order
+    # with a bounded number of pages in flight
+    workers = workers or OCR_WORKERS
+    if page_numbers is None:
+        page_numbers = range(get_page_count(file_path))
+    page_numbers = list(page_numbers)
+
+    if not page_numbers:
+        return
+
+    if workers <= 1 or len(page_numbers) <= 1:
+        with fitz.open(file_path) as doc:
+            for page_number in page_numbers:
+                yield from ocr_document_page(doc, page_number, filename)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(page_numbers)), mp_context=_MP_CONTEXT,
+                             initializer=_init_ocr_worker, initargs=(file_path, filename)) as executor:
+        for page_chunks in iter_ordered_results(executor, _ocr_worker_page, page_numbers, workers * 2):
+            yield from page_chunks
+
+
+def extract_text_and_tables_from_scanned_pdf(file_path, filename, workers=None):
+    return list(iter_scanned_pdf_chunks(file_path, filename, workers))
+
+
+def split_workers(text_pages, ocr_pages, budget=None):
+    # Both pools run at once, so together they get one budget of processes,
+    # shared in proportion to their pages (OCR capped at OCR_WORKERS). A
+    # side with a single worker runs in-process.
+    budget = budget or PDF_WORKERS
+    if not ocr_pages:
+        return budget, 1
+    if not text_pages:
+        return 1, min(budget, OCR_WORKERS)
+    ocr_workers = min(OCR_WORKERS, budget - 1, max(1, round(budget * ocr_pages / (text_pages + ocr_pages))))
+    return max(1, budget - ocr_workers), max(1, ocr_workers)
+
+
+def iter_routed_chunks(file_path, filename, page_numbers=None):
+    # Every page is classified up front and sent to the cheapest extractor that
+    # works for it; both extractors run at the same time and their output is
+    # merged back in page order. page_numbers (0-based) limits extraction to
+    # those pages.
+    routes = classify_pages(file_path)
+    wanted = set(range(len(routes)) if page_numbers is None else page_numbers)
+    text_pages = [n for n, route in enumerate(routes) if route == PAGE_TEXT and n in wanted]
+    ocr_pages = [n for n, route in enumerate(routes) if route == PAGE_OCR and n in wanted]
+
+    if DEBUG:
+        print(f"[DEBUG] {len(text_pages)} text pages, {len(ocr_pages)} OCR pages, "
+              f"{len(wanted) - len(text_pages) - len(ocr_pages)} empty pages")
+
+    text_workers, ocr_workers = split_workers(len(text_pages), len(ocr_pages))
+    yield from heapq.merge(
+        iter_text_pdf_chunks(file_path, filename, workers=text_workers, page_numbers=text_pages),
+        iter_scanned_pdf_chunks(file_path, filename, workers=ocr_workers, page_numbers=ocr_pages),
+        key=lambda chunk: chunk["page_number"]
+    )
+
+
+def iter_pdf_chunks(file_path: str, file_hash: str = None):
+    # Streaming counterpart of process_pdf. Known files (by content hash) are
+    # served from the on-disk chunk cache; new ones are extracted and cached.
     filename = os.path.basename(file_path)
-    all_chunks = []
+    file_hash = file_hash or get_file_hash(file_path)
 
-    try:
-        # Try text-based processing first
-        text_chunks = extract_text_and_tables_from_text_pdf(file_path, filename)
-        if text_chunks:
-            if DEBUG:
-                print("[DEBUG] Processed as text-based PDF")
-            all_chunks.extend(text_chunks)
-        else:
-            if DEBUG:
-                print("[DEBUG] No text found, switching to OCR")
-            ocr_chunks = extract_text_and_tables_from_scanned_pdf(file_path, filename)
-            all_chunks.extend(ocr_chunks)
+    cached = load_cached_chunks(file_hash)
+    if cached is not None:
+        if DEBUG:
+            print(f"[DEBUG] Loaded {len(cached)} chunks from cache")
+        yield from cached
+        return
 
+    # Extraction errors propagate: a stream that just ended here would look
+    # like a complete document, and its upload would be marked finished
+    try:
+        yield from iter_and_cache(file_hash, iter_routed_chunks(file_path, filename))
     except Exception as e:
         print(f"[ERROR] Failed to process PDF: {e}")
+        raise
+
 
-    return all_chunks
+def process_pdf(file_path: str, file_hash: str = None):
+    return list(iter_pdf_chunks(file_path, file_hash))
 
-__all__ = ["process_pdf", "get_file_hash"]
+__all__ = ["process_pdf", "iter_pdf_chunks", "iter_routed_chunks", "classify_pages", "page_fingerprints", "get_file_hash"]
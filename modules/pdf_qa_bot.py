@@ -1,13 +1,19 @@
 # modules/pdf_qa_bot.py
 
 import os
-import requests
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from rapidfuzz import fuzz
 from modules.retriever import retrieve_top_chunks
+from modules.document_registry import get_document_registry
+from modules.llm_client import get_llm_client, LLMError
+from modules.pinecone_handler import embed_query, embed_texts
+from modules.response_cache import get_response_cache, pdf_scope, is_cacheable, RESPONSE_CACHE_ENABLED
+from modules.context_packer import pack_context, CONTEXT_TOKEN_BUDGET
 
 # === Groq Configuration ===
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Requests go through the shared pooled client in modules/llm_client.py
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-70b-8192")
 
 # === Utility ===
@@ -19,27 +25,15 @@ def fuzzy_contains(target, source, threshold=85):
     return fuzz.partial_ratio(target.lower(), source.lower()) >= threshold
 
 # === Prompt Builder ===
-def build_prompt(query: str, chunks: list) -> str:
-    query_lower = query.lower()
-    matched_chunks = []
+# Exact-term matching now happens at retrieval time (BM25 fused with vector
+# scores in retrieve_top_chunks), so chunks arrive already ranked. The context
+# is packed by relevance, without near-duplicates, up to a token budget.
+def build_prompt(query: str, chunks: list, max_context_tokens: int = CONTEXT_TOKEN_BUDGET) -> str:
+    context_blocks = pack_context(chunks, max_context_tokens)
 
-    for i, chunk in enumerate(chunks):
-        text = chunk.get("text", "").lower()
-        table = chunk.get("table_text", "").lower()
-        combined = f"{text} {table}".strip()
-
-        if all(term in combined for term in query_lower.split() if term not in ['what', 'are', 'the', 'is', 'in', 'of', 'as', 'at']):
-            matched_chunks.append(chunk)
-
-    if not matched_chunks:
+    if not context_blocks:
         return "No relevant information found."
 
-    context_blocks = []
-    for chunk in matched_chunks:
-        context_blocks.append("\n".join(
-            filter(None, [chunk.get("text", ""), chunk.get("table_text", "")])
-        ))
-
     context = "\n\n".join(context_blocks)
 
     return f"""
@@ -64,59 +58,146 @@ Answer:
 
 
 # === Groq Query Function ===
-def generate_answer(query: str, chunks: list) -> str:
+def _messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _report_llm_error(e: Exception) -> str:
+    if isinstance(e, LLMError) and e.status_code is not None:
+        print(f"[ERROR] Groq API Status: {e.status_code}")
+        print(f"[ERROR] Groq API Response: {e.body}")
+        return "❌ Groq API Error: Unable to retrieve answer."
+    print(f"[ERROR] Groq call failed: {e}")
+    return "❌ Failed to generate answer from Groq."
+
+
+class StreamError(str):
+    # The error message that ends a failed stream; marks the answer as broken
+    # (possibly truncated) so it is never cached
+    pass
+
+
+def _stream_groq(prompt: str):
+    try:
+        yield from get_llm_client().stream_chat(_messages(prompt), GROQ_MODEL, temperature=0.2)
+    except Exception as e:
+        yield StreamError(_report_llm_error(e))
+
+
+# With stream=True the answer comes back as a generator of text pieces as
+# Groq produces them; otherwise as one string once generation is done.
+def generate_answer(query: str, chunks: list, stream: bool = False):
     prompt = build_prompt(query, chunks)
 
     #print(f"[DEBUG] Prompt length: {len(prompt)} characters")
 
     if prompt.strip() == "No relevant information found.":
       #  print("[DEBUG] ❌ No relevant chunks matched entity.")
-        return "Information not provided."
+        return iter(["Information not provided."]) if stream else "Information not provided."
+
+    if stream:
+        return _stream_groq(prompt)
 
     #print("[DEBUG] 🤖 Sending prompt to Groq...")
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": GROQ_MODEL,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.2
-            }
-        )
-
-        if response.status_code == 200:
-            result = response.json()
-            answer = result["choices"][0]["message"]["content"]
-            #print(f"[DEBUG] ✅ Groq Response:\n{answer}\n")
-
-            return answer.strip()
-        else:
-            print(f"[ERROR] Groq API Status: {response.status_code}")
-            print(f"[ERROR] Groq API Response: {response.text}")
-
-            return "❌ Groq API Error: Unable to retrieve answer."
+        answer = get_llm_client().chat(_messages(prompt), GROQ_MODEL, temperature=0.2)
+        #print(f"[DEBUG] ✅ Groq Response:\n{answer}\n")
+        return answer.strip()
 
     except Exception as e:
-        print(f"[ERROR] Groq call failed: {e}")
-        return "❌ Failed to generate answer from Groq."
+        return _report_llm_error(e)
+
+
+def _cache_streamed(pieces, scope: str, query: str, embedding):
+    # Pass pieces through and cache the full answer once the stream completes
+    # cleanly; a stream that failed part-way is not cached
+    collected = []
+    for piece in pieces:
+        if isinstance(piece, StreamError):
+            yield piece
+            return
+        collected.append(piece)
+        yield piece
+
+    answer = "".join(collected).strip()
+    if RESPONSE_CACHE_ENABLED and is_cacheable(answer):
+        get_response_cache().put(scope, query, answer, embedding)
 
 # === Main Question Handler ===
-def ask_pdf_question(query: str, file_hash: str) -> str:
-    chunks = retrieve_top_chunks(query, file_hash)
+# file_hashes may be a single hash or any collection of them; every
+# document is searched in parallel and the best chunks overall are used.
+# Answers are cached per (document set, question); a paraphrase close enough
+# to a cached question is served from the cache too, with no Groq call.
+# stream=True returns a generator of answer pieces (see generate_answer).
+# Raises SupersededDocumentError for a document replaced by a newer version.
+def ask_pdf_question(query: str, file_hashes, stream: bool = False, embedding=None):
+    get_document_registry().check_current(file_hashes)
+    scope = pdf_scope(file_hashes)
+
+    if RESPONSE_CACHE_ENABLED:
+        # Exact repeats are answered without loading the embedding model;
+        # only a miss embeds the question for the semantic lookup
+        cached = get_response_cache().get(scope, query)
+        if cached is None:
+            if embedding is None:
+                embedding = embed_query(query)
+            cached = get_response_cache().get(scope, query, embedding)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+
+    if embedding is None:
+        embedding = embed_query(query)
+
+    chunks = retrieve_top_chunks(query, file_hashes, embedding=embedding)
 
     if not chunks:
-        return "❌ No relevant content found in Pinecone index."
+        message = "❌ No relevant content found in the vector index."
+        return iter([message]) if stream else message
 
     #print(f"[DEBUG] Retrieved {len(chunks)} chunks for query: {query}")
     #for i, c in enumerate(chunks):
      #   print(f"[CHUNK DEBUG] Chunk {i+1}:\nText: {c.get('text', '')[:300]}\nTable: {c.get('table_text', '')[:300]}\n")
 
-
-    return generate_answer(query, chunks)
+    if stream:
+        return _cache_streamed(generate_answer(query, chunks, stream=True), scope, query, embedding)
+
+    answer = generate_answer(query, chunks)
+    if RESPONSE_CACHE_ENABLED and is_cacheable(answer):
+        get_response_cache().put(scope, query, answer, embedding)
+    return answer
+
+
+# === Batch Question Handler ===
+BATCH_QA_WORKERS = int(os.getenv("BATCH_QA_WORKERS", "8"))  # Questions answered at once
+
+
+# Answers many questions over the same document set. All questions are
+# embedded in one batch up front; retrieval and generation then run on a
+# bounded thread pool (the LLM client's semaphore caps Groq requests on top).
+# Returns one {"question", "answer", "seconds"} dict per question, in order.
+def ask_pdf_questions(questions, file_hashes, max_workers: int = BATCH_QA_WORKERS) -> list:
+    questions = [q for q in questions if q and q.strip()]
+    if not questions:
+        return []
+
+    embeddings = embed_texts(questions)
+
+    def answer_one(item):
+        question, embedding = item
+        started = time.perf_counter()
+        try:
+            answer = ask_pdf_question(question, file_hashes, embedding=embedding)
+        except Exception as e:
+            print(f"[ERROR] Batch question failed: {question!r}: {e}")
+            answer = "❌ Failed to answer question."
+        return {
+            "question": question,
+            "answer": answer,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(questions)))) as executor:
+        return list(executor.map(answer_one, zip(questions, embeddings)))
@@ -2,38 +2,33 @@
 
 import os
 import hashlib
-from typing import List
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+from modules.vector_store import get_vector_store, VECTOR_STORE
+from modules.upsert_manifest import UpsertManifest, record_existing
+from modules.document_registry import get_document_registry
+from modules.embedding_cache import cached_encode, acached_encode
+from modules.embedding_service import get_embedding_service
 
-# === Load env vars ===
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "fingenai-index")
-
-# === Pinecone Init (✅ NEW SYNTAX) ===
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-if PINECONE_INDEX_NAME not in pc.list_indexes().names():
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=384,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
+# === Embedding ===
+# Encoding goes through the process-wide embedding service (one model, shared
+# micro-batches) behind the on-disk embedding cache, so repeated table rows,
+# boilerplate and repeated questions are only ever encoded once.
+def embed_texts(texts: List[str]):
+    return cached_encode(texts, get_embedding_service().encode).tolist()
 
-index = pc.Index(PINECONE_INDEX_NAME)
 
-# === Sentence Transformer Model ===
-model = SentenceTransformer("all-MiniLM-L6-v2")
+def embed_query(query: str):
+    return cached_encode([query], get_embedding_service().encode)[0].tolist()
 
 
-# === Embedding ===
-def embed_texts(texts: List[str]):
-    return model.encode(texts, show_progress_bar=False).tolist()
+async def aembed_texts(texts: List[str]):
+    return (await acached_encode(texts, get_embedding_service().aencode)).tolist()
 
 
-def embed_query(query: str):
-    return model.encode([query])[0].tolist()
+async def aembed_query(query: str):
+    return (await acached_encode([query], get_embedding_service().aencode))[0].tolist()
 
 
 # === File Hashing ===
@@ -43,10 +38,28 @@ def compute_file_hash(filepath: str) -> str:
 
 
 # === Check namespace ===
+# Name kept for existing callers; answers for whichever backend VECTOR_STORE
+# selects. The local upsert manifest is authoritative: complete means indexed,
+# present but incomplete means an interrupted ingest that still has to resume.
+# A version whose namespace has since been re-indexed with a newer version of
+# the same document is no longer there. Only documents with no manifest at all
+# fall back to asking the backend.
 def vectors_exist_in_pinecone(file_hash: str):
+    registry = get_document_registry()
+    if registry.is_superseded(file_hash):
+        return False
+
+    manifest = UpsertManifest(file_hash, VECTOR_STORE)
+    if manifest.complete:
+        return True
+    if manifest.exists():
+        return False
+
     try:
-        stats = index.describe_index_stats()
-        return file_hash in stats.namespaces and stats.namespaces[file_hash]["vector_count"] > 0
+        if get_vector_store().exists(registry.namespace(file_hash)):
+            record_existing(file_hash, VECTOR_STORE)
+            return True
+        return False
     except Exception as e:
         print(f"[ERROR] Pinecone namespace check failed: {e}")
         return False
@@ -55,66 +68,123 @@ def vectors_exist_in_pinecone(file_hash: str):
 # === Upload vectors ===
 from tqdm import tqdm
 
-def upload_embeddings_to_pinecone(file_hash: str, chunks: List[dict], batch_size: int = 100):
-    vectors = []
-    texts = [chunk.get("text", "") or chunk.get("table_text", "") for chunk in chunks]
-    embeddings = embed_texts(texts)
-   
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))  # Concurrent upsert requests
+
+
+def chunk_text(chunk: dict) -> str:
+    return chunk.get("text", "") or chunk.get("table_text", "")
 
-    for i, embedding in enumerate(embeddings):
-        meta = chunks[i].get("metadata", {})
-        meta.update({"text": texts[i]})  # include actual text for display
 
-        vectors.append({
-            "id": f"{file_hash}_{i}",
-            "values": embedding,
-            "metadata": meta
-        })
+def chunk_metadata(chunk: dict, text: str) -> dict:
+    meta = dict(chunk.get("metadata", {}))
+    meta["text"] = text  # include actual text for display
+    for key in ("source", "page_number", "type", "row_index"):
+        if chunk.get(key) is not None:
+            meta[key] = chunk[key]
+    return meta
 
-    #print(f"[DEBUG] Total vectors to upload: {len(vectors)}")
 
-    # ✅ Upload in smaller batches
-    for i in tqdm(range(0, len(vectors), batch_size), desc="Uploading to Pinecone"):
-        batch = vectors[i:i + batch_size]
-        for chunk in chunks:
-            if "Nestlé Algérie SpA" in chunk.get("table_text", ""):
-        # Do something
-                pass
+def iter_batches(items: Iterable, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-            print(f"[INDEXING] Uploading Nestlé Algérie SpA row:\n{chunk}")
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
 
-        #if "Nestlé Algérie SpA" in chunk.get("table_text", ""):
-           # print(f"[DEBUG] ✅ Uploading to Pinecone (Page {chunk['metadata'].get('page_number')}): {chunk['table_text']}")
+def _upsert_batch(store, vectors: List[dict], namespace: str, start: int, batch_index: int, manifest=None):
+    # Returns (vectors stored, ok); a failed batch is left out of the manifest
+    # so the next run of the same ingest sends it again
+    try:
+        store.upsert(vectors, namespace=namespace)
+    except Exception as e:
+        print(f"[❌ ERROR] Failed to upload batch {start}-{start + len(vectors)}: {e}")
+        return 0, False
+
+    if manifest is not None:
+        manifest.mark_done(batch_index, len(vectors))
+    return len(vectors), True
+
+
+# Streams chunks through fixed-size embedding batches into concurrent upserts.
+# `chunks` may be any iterable (e.g. pdf_processor.iter_pdf_chunks); only a
+# handful of batches are alive at once, so memory stays flat with document
+# size. Each batch is upserted exactly once; with a manifest, batches it
+# already records are skipped without embedding (resume) and the manifest is
+# marked complete once every batch is in. Vectors go to `namespace`, which
+# defaults to the file hash. Returns the number of vectors stored.
+def upload_embeddings_to_pinecone(file_hash: str, chunks: Iterable[dict], batch_size: int = 100,
+                                  max_workers: int = UPSERT_WORKERS, manifest: UpsertManifest = None,
+                                  namespace: str = None) -> int:
+    store = get_vector_store()
+    namespace = namespace or file_hash
+
+    # Backpressure: once every worker is busy and one batch is queued, the
+    # embedding loop (and the extractor feeding it) waits for a free slot.
+    slots = threading.BoundedSemaphore(max_workers + 1)
+    futures = []
+    offset = 0
+    resumed = 0
+    # A buffering backend (local FAISS) only has a batch once it is flushed,
+    # so those batches go into the manifest after the flush, not as they land
+    batch_manifest = manifest if store.durable else None
 
-        try:
-            index.upsert(vectors=batch, namespace=file_hash)
-        except Exception as e:
-            print(f"[❌ ERROR] Failed to upload batch {i}-{i + batch_size}: {e}")
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch_index, batch in enumerate(tqdm(iter_batches(chunks, batch_size), desc="Uploading vectors")):
+                if manifest is not None and manifest.is_done(batch_index):
+                    offset += len(batch)
+                    resumed += len(batch)
+                    continue
+
+                texts = [chunk_text(chunk) for chunk in batch]
+                embeddings = embed_texts(texts)
+
+                vectors = [
+                    {
+                        "id": chunk.get("id") or f"{file_hash}_{offset + i}",
+                        "values": embedding,
+                        "metadata": chunk_metadata(chunk, text)
+                    }
+                    for i, (chunk, text, embedding) in enumerate(zip(batch, texts, embeddings))
+                ]
+
+                slots.acquire()
+                future = executor.submit(_upsert_batch, store, vectors, namespace, offset, batch_index,
+                                         batch_manifest)
+                future.add_done_callback(lambda _: slots.release())
+                futures.append((batch_index, future))
+                offset += len(vectors)
+    finally:
+        # Also on failure: what was upserted is kept, and the lock released.
+        # Every submitted batch has finished here (the executor waited), so
+        # once the flush succeeds the buffered ones are recorded as well and
+        # an interrupted ingest resumes after them.
+        store.flush(namespace)
+        if manifest is not None and batch_manifest is None:
+            for batch_index, future in futures:
+                count, ok = future.result()
+                if ok:
+                    manifest.mark_done(batch_index, count)
+
+    results = [(batch_index, f.result()) for batch_index, f in futures]
+    stored = resumed + sum(count for _, (count, _) in results)
+    if manifest is not None and all(ok for _, (_, ok) in results):
+        manifest.mark_complete(stored)
+    return stored
 
 
 
 # === Query ===
+# Returns a list of {"id", "score", "metadata"} matches from the configured backend
 def query_pinecone_index(query_text, top_k=5, namespace=None):
-    import numpy as np
-
-    embedding = model.encode([query_text])[0].tolist()
-    if isinstance(embedding, np.ndarray):
-        embedding = embedding.tolist()
-
-    embedding = [float(x) for x in embedding]
+    embedding = embed_query(query_text)
 
     try:
-        query_args = {
-            "vector": embedding,
-            "top_k": top_k,
-            "include_metadata": True
-        }
-        if namespace:
-            query_args["namespace"] = namespace
-
-        response = index.query(**query_args)
-        return response
+        return get_vector_store().query(embedding, top_k=top_k, namespace=namespace)
     except Exception as e:
-        print(f"[❌ Pinecone Query Error] {e}")
+        print(f"[❌ Vector Store Query Error] {e}")
         return None
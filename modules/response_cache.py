@@ -0,0 +1,144 @@
+# modules/response_cache.py
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+# === Config ===
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join("cache", "responses.sqlite3"))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", str(7 * 24 * 3600)))
+SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.95"))  # cosine
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+# === Keys ===
+def normalize_question(question: str) -> str:
+    return ' '.join((question or "").lower().split()).rstrip("?.! ")
+
+
+def pdf_scope(file_hashes) -> str:
+    if isinstance(file_hashes, str):
+        file_hashes = [file_hashes]
+    return "pdf:" + ",".join(sorted(set(h for h in file_hashes if h)))
+
+
+def _numbers(question: str) -> frozenset:
+    # "revenue 2023" and "revenue 2024" embed almost identically; never let a
+    # semantic hit cross different years or figures
+    return frozenset(_NUMBER_RE.findall(question))
+
+
+# === Cache ===
+# SQLite table keyed on (scope, normalized question). A miss on the exact key
+# can still hit semantically: the closest cached question in the same scope
+# with cosine >= SEMANTIC_THRESHOLD and the same numbers. Entries expire after
+# RESPONSE_CACHE_TTL_S and the least recently used go first past
+# RESPONSE_CACHE_MAX_ENTRIES.
+class ResponseCache:
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl_s: float = RESPONSE_CACHE_TTL_S, threshold: float = SEMANTIC_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                scope TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (scope, question)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def _touch(self, scope, question, now):
+        self._db.execute("UPDATE responses SET last_used = ? WHERE scope = ? AND question = ?",
+                         (now, scope, question))
+
+    def get(self, scope: str, question: str, embedding=None):
+        key = normalize_question(question)
+        now = time.time()
+        oldest = now - self.ttl_s
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM responses WHERE scope = ? AND question = ? AND created >= ?",
+                (scope, key, oldest)
+            ).fetchone()
+            if row:
+                self._touch(scope, key, now)
+                return row[0]
+
+            if embedding is None:
+                return None
+
+            rows = self._db.execute(
+                "SELECT question, answer, embedding FROM responses "
+                "WHERE scope = ? AND created >= ? AND embedding IS NOT NULL",
+                (scope, oldest)
+            ).fetchall()
+            numbers = _numbers(key)
+            rows = [r for r in rows if _numbers(r[0]) == numbers]
+            if not rows:
+                return None
+
+            query = np.asarray(embedding, dtype="float32")
+            query = query / (np.linalg.norm(query) or 1.0)  # never modify the caller's array
+            matrix = np.stack([np.frombuffer(r[2], dtype="float32") for r in rows])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            self._touch(scope, rows[best][0], now)
+            return rows[best][1]
+
+    def put(self, scope: str, question: str, answer: str, embedding=None):
+        key = normalize_question(question)
+        blob = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype="float32")
+            blob = (vector / (np.linalg.norm(vector) or 1.0)).astype("float32").tobytes()
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (scope, question, answer, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, key, answer, blob, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+        self._db.execute(
+            "DELETE FROM responses WHERE rowid IN ("
+            "SELECT rowid FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> ResponseCache:
+    return ResponseCache()
+
+
+def is_cacheable(answer: str) -> bool:
+    # Error strings from the Groq/vector-store paths must never be replayed
+    return bool(answer) and not answer.lstrip().startswith("❌")
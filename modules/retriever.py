@@ -1,36 +1,142 @@
-from modules.pinecone_handler import query_pinecone_index
+import os
+from concurrent.futures import ThreadPoolExecutor
+from modules.pinecone_handler import embed_query
+from modules.vector_store import get_vector_store
+from modules.bm25_index import load_bm25_index
+from modules.document_registry import get_document_registry
 
 TOP_K = 20  # Customize as needed
+MAX_PARALLEL_QUERIES = 8  # Namespaces searched at once
+
+# Hybrid retrieval: vector and BM25 rankings merged by reciprocal rank fusion
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") != "0"
+RRF_K = 60
+VECTOR_WEIGHT = 1.0
+LEXICAL_WEIGHT = 1.0
 
 # modules/retriever.py
 
 
-def retrieve_top_chunks(query: str, file_hash: str) -> list:
-    #print(f"[DEBUG] 🔍 Querying Pinecone with file_hash: {file_hash}")
+def _as_hash_list(file_hashes) -> list:
+    # Accept a single file hash or any iterable of them, dropping duplicates
+    if isinstance(file_hashes, str):
+        file_hashes = [file_hashes]
+    return list(dict.fromkeys(h for h in file_hashes if h))
+
+
+def _query_namespace(store, embedding, file_hash: str, top_k: int) -> list:
+    # A re-indexed version of a document shares the namespace of its first version
+    namespace = get_document_registry().namespace(file_hash)
+    try:
+        matches = store.query(embedding, top_k=top_k, namespace=namespace)
+    except Exception as e:
+        print(f"[ERROR] ❌ Vector store query failed for {file_hash}: {e}")
+        return []
+
+    for match in matches:
+        match["file_hash"] = file_hash
+    return matches
+
+
+def _lexical_namespace(query: str, file_hash: str, top_k: int) -> list:
+    # BM25 over the document's inverted index; scores are scaled to the best hit
+    # in that document so they are comparable across files.
+    index = load_bm25_index(file_hash)
+    if index is None:
+        return []
+
+    matches = index.search(query, top_k)
+    if matches:
+        best = matches[0]["score"] or 1.0
+        for match in matches:
+            match["file_hash"] = file_hash
+            match["relative_score"] = match["score"] / best
+    return matches
+
+
+def fuse_matches(vector_matches: list, lexical_matches: list, top_k: int) -> list:
+    # Reciprocal rank fusion: each list contributes weight / (RRF_K + rank), so a
+    # chunk that is strong in either list ranks well and one strong in both wins.
+    fused = {}
+    lexical_matches = sorted(lexical_matches, key=lambda m: m["relative_score"], reverse=True)[:top_k]
+
+    for weight, score_key, ranked in ((VECTOR_WEIGHT, "vector_score", vector_matches),
+                                      (LEXICAL_WEIGHT, "lexical_score", lexical_matches)):
+        for rank, match in enumerate(ranked, start=1):
+            key = (match["file_hash"], match["id"])
+            entry = fused.setdefault(key, {
+                "id": match["id"],
+                "file_hash": match["file_hash"],
+                "metadata": match["metadata"],
+                "score": 0.0,
+                "vector_score": None,
+                "lexical_score": None,
+            })
+            entry["score"] += weight / (RRF_K + rank)
+            entry[score_key] = match["score"]
+
+    return sorted(fused.values(), key=lambda m: m["score"], reverse=True)[:top_k]
+
+
+def retrieve_top_chunks(query: str, file_hashes, top_k: int = TOP_K, embedding=None) -> list:
+    #print(f"[DEBUG] 🔍 Querying vector store with file_hashes: {file_hashes}")
+
+    file_hashes = _as_hash_list(file_hashes)
+    if not file_hashes:
+        return []
+    # Their namespaces now hold a newer version; searching them would answer
+    # from another document's content
+    get_document_registry().check_current(file_hashes)
 
     try:
-        response = query_pinecone_index(query_text=query, top_k=TOP_K, namespace=file_hash)
+        # Embed once, then fan the same vector out to every document's namespace
+        store = get_vector_store()
+        if embedding is None:
+            embedding = embed_query(query)
+
+        if len(file_hashes) == 1:
+            per_namespace = [_query_namespace(store, embedding, file_hashes[0], top_k)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_QUERIES, len(file_hashes))) as executor:
+                per_namespace = list(executor.map(
+                    lambda h: _query_namespace(store, embedding, h, top_k), file_hashes
+                ))
+
+        # Global top-k across all documents by similarity score
+        vector_matches = sorted(
+            (m for group in per_namespace for m in group),
+            key=lambda m: m.get("score") or 0.0,
+            reverse=True
+        )[:top_k]
+
+        if HYBRID_SEARCH:
+            lexical_matches = [m for h in file_hashes for m in _lexical_namespace(query, h, top_k)]
+            matches = fuse_matches(vector_matches, lexical_matches, top_k)
+        else:
+            matches = vector_matches
 
-        if not response or not response.matches:
+        if not matches:
             print("[DEBUG] ❌ No matches found.")
             return []
 
-       # print(f"[DEBUG] ✅ Matches found: {len(response.matches)}")
+       # print(f"[DEBUG] ✅ Matches found: {len(matches)}")
 
         results = []
 
-        for i, match in enumerate(response.matches):
-            metadata = match.metadata or {}
+        for i, match in enumerate(matches):
+            metadata = dict(match["metadata"] or {})
+            metadata.setdefault("file_hash", match["file_hash"])
 
             text = metadata.get("text", "").strip()
             table_text = metadata.get("table_text", "").strip()
-            page = metadata.get("page_number", "N/A")
 
-           
             if text or table_text:  # ✅ Only append if useful
                 results.append({
                     "text": text,
                     "table_text": table_text,
+                    "score": match.get("score"),
+                    "vector_score": match.get("vector_score", match.get("score")),
+                    "lexical_score": match.get("lexical_score"),
                     "metadata": metadata
                 })
 
@@ -42,5 +148,5 @@ def retrieve_top_chunks(query: str, file_hash: str) -> list:
         return results
 
     except Exception as e:
-        print(f"[ERROR] ❌ Pinecone query failed: {e}")
+        print(f"[ERROR] ❌ Vector store query failed: {e}")
         return []
@@ -1,30 +1,144 @@
+import os
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 import numpy as np
 
-def forecast_expense(df, category='Overall', months=3):
-    df['Month'] = df['Date'].dt.to_period('M').astype(str)
+# "linear": least-squares trend per category (the original model)
+# "seasonal": additive Holt-Winters with a yearly season, for 2+ years of data
+FORECAST_MODEL = os.getenv("FORECAST_MODEL", "linear")
+SEASON_MONTHS = 12
+HW_ALPHA = float(os.getenv("HW_ALPHA", "0.3"))  # level
+HW_BETA = float(os.getenv("HW_BETA", "0.1"))    # trend
+HW_GAMMA = float(os.getenv("HW_GAMMA", "0.2"))  # season
 
-    if category != 'Overall':
-        df = df[df['Category'] == category]
 
-    monthly_summary = df[df['Amount'] < 0].groupby('Month')['Amount'].sum().abs().reset_index()
-    monthly_summary['MonthIndex'] = np.arange(len(monthly_summary))
+# === Monthly matrix ===
+# Integer year*100+month keys: much cheaper to group by than period strings
+def month_keys(dates):
+    return (dates.dt.year * 100 + dates.dt.month).rename('MonthKey')
 
-    if len(monthly_summary) < 2:
-        return None, "Not enough data to forecast."
 
-    model = LinearRegression()
-    X = monthly_summary[['MonthIndex']]
-    y = monthly_summary['Amount']
-    model.fit(X, y)
+def month_labels(keys):
+    return (keys // 100).astype(str) + '-' + (keys % 100).map('{:02d}'.format)
+
+
+def monthly_totals(df):
+    # Month ("YYYY-MM"), Category, Amount (expenses as positive numbers); the
+    # same frame expense_analyzer.TransactionSummary.monthly_totals() returns
+    expense_df = df[df['Amount'] < 0]
+    keys = [month_keys(expense_df['Date'])] + (['Category'] if 'Category' in expense_df else [])
+    monthly = expense_df.groupby(keys)['Amount'].sum().abs().reset_index()
+    if 'Category' not in monthly:
+        monthly['Category'] = 'Overall'
+    monthly.insert(0, 'Month', month_labels(monthly.pop('MonthKey')))
+    return monthly
+
+
+def monthly_matrix(monthly):
+    # Month x category matrix of expenses plus an 'Overall' column; NaN marks
+    # a month in which a category had no expenses
+    matrix = monthly.pivot_table(index='Month', columns='Category', values='Amount', aggfunc='sum')
+    if 'Overall' not in matrix:
+        matrix['Overall'] = monthly.groupby('Month')['Amount'].sum()
+    return matrix.sort_index()
+
+
+def _future_months(last_month, months):
+    start = pd.Period(last_month, freq='M')
+    return [(start + k).strftime('%Y-%m') for k in range(1, months + 1)]
+
+
+# === Models ===
+# Both fit every column of the matrix at once; cost is one pass over the
+# matrix whatever the number of categories.
+def linear_forecast(matrix, months=3):
+    # Closed-form least squares per column. As in the original per-category
+    # LinearRegression, x counts only the months a category has expenses in,
+    # and the forecast continues from its last such month.
+    values = matrix.to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    n = present.sum(axis=0)
+    x = np.where(present, np.cumsum(present, axis=0) - 1, 0.0)
+    y = np.where(present, values, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = x.sum(axis=0) / n
+        y_mean = y.sum(axis=0) / n
+        dx = np.where(present, x - x_mean, 0.0)
+        dy = np.where(present, y - y_mean, 0.0)
+        slope = (dx * dy).sum(axis=0) / (dx * dx).sum(axis=0)
+        intercept = y_mean - slope * x_mean
+
+    steps = n + np.arange(months)[:, None]
+    predictions = intercept + slope * steps
 
-    future_indices = np.arange(len(monthly_summary), len(monthly_summary) + months).reshape(-1, 1)
-    forecast = model.predict(future_indices)
+    last = np.where(n > 0, len(values) - 1 - np.argmax(present[::-1], axis=0), -1)
+    return predictions, n >= 2, [matrix.index[i] if i >= 0 else None for i in last]
 
-    future_months = pd.date_range(start=pd.to_datetime(monthly_summary['Month'].iloc[-1]) + pd.DateOffset(months=1),
-                                  periods=months, freq='M').strftime('%Y-%m')
 
-    forecast_df = pd.DataFrame({'Month': future_months, 'Predicted_Expense': forecast.round(2)})
-    return forecast_df, None
+def seasonal_forecast(matrix, months=3, season=SEASON_MONTHS, alpha=HW_ALPHA, beta=HW_BETA, gamma=HW_GAMMA):
+    # Additive Holt-Winters over the calendar months from first to last,
+    # months without expenses counting as zero; recursions run over time,
+    # vectorised across categories. Needs two full seasons to initialise.
+    calendar = pd.period_range(matrix.index[0], matrix.index[-1], freq='M').strftime('%Y-%m')
+    values = matrix.reindex(calendar).fillna(0.0).to_numpy(dtype=float)
+    if len(values) < 2 * season:
+        return None
+
+    level = values[:season].mean(axis=0)
+    trend = (values[season:2 * season].mean(axis=0) - level) / season
+    seasonal = values[:season] - level
+
+    for t in range(len(values)):
+        s = seasonal[t % season].copy()
+        previous_level = level
+        level = alpha * (values[t] - s) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+        seasonal[t % season] = gamma * (values[t] - level) + (1 - gamma) * s
+
+    horizon = np.arange(1, months + 1)[:, None]
+    predictions = level + horizon * trend + seasonal[(len(values) + horizon.ravel() - 1) % season]
+    # A strong seasonal dip can push the extrapolation below zero spend
+    predictions = np.maximum(predictions, 0.0)
+    return predictions, np.ones(values.shape[1], dtype=bool), [calendar[-1]] * values.shape[1]
+
+
+# === Forecasts ===
+def forecast_categories(monthly, months=3, model=None):
+    # Long frame of Category, Month, Predicted_Expense for every category and
+    # 'Overall' with enough history. The seasonal model falls back to the
+    # linear one when there are fewer than two years of months.
+    matrix = monthly_matrix(monthly)
+    if matrix.empty:
+        return pd.DataFrame(columns=['Category', 'Month', 'Predicted_Expense'])
+
+    result = None
+    if (model or FORECAST_MODEL) == 'seasonal':
+        result = seasonal_forecast(matrix, months)
+    if result is None:
+        result = linear_forecast(matrix, months)
+    predictions, enough, last_months = result
+
+    keep = np.flatnonzero(enough)
+    if not len(keep):
+        return pd.DataFrame(columns=['Category', 'Month', 'Predicted_Expense'])
+    future = {m: _future_months(m, months) for m in {last_months[j] for j in keep}}
+    return pd.DataFrame({
+        'Category': np.repeat(matrix.columns[keep].to_numpy(), months),
+        'Month': [month for j in keep for month in future[last_months[j]]],
+        'Predicted_Expense': predictions[:, keep].T.ravel().round(2),
+    })
+
+
+def forecast_monthly_totals(monthly, category='Overall', months=3, model=None):
+    # Single-category forecast from Month/Category/Amount totals, e.g.
+    # expense_analyzer.TransactionSummary.monthly_totals() of a large file
+    forecasts = forecast_categories(monthly, months, model)
+    forecast_df = forecasts[forecasts['Category'] == category]
+    if forecast_df.empty:
+        return None, "Not enough data to forecast."
+    return forecast_df[['Month', 'Predicted_Expense']].reset_index(drop=True), None
+
 
+def forecast_expense(df, category='Overall', months=3, model=None):
+    # Leaves df untouched
+    return forecast_monthly_totals(monthly_totals(df), category, months, model)
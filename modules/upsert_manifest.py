@@ -0,0 +1,99 @@
+# modules/upsert_manifest.py
+
+import os
+import json
+import threading
+
+# === Config ===
+UPSERT_MANIFEST_DIR = os.getenv("UPSERT_MANIFEST_DIR", os.path.join("indices", "manifests"))
+
+
+# === Manifest ===
+# Append-only JSONL log of one document's upload to one vector-store backend:
+# a header line with the batch size, one line per batch once it is stored,
+# and a final line when every batch is in. Re-running an interrupted ingest
+# with the same batch size skips the batches already logged, and a finished
+# manifest answers "is this document indexed?" without asking the backend.
+class UpsertManifest:
+    def __init__(self, file_hash: str, backend: str, batch_size: int = None):
+        self.file_hash = file_hash
+        self.backend = backend
+        self.path = os.path.join(UPSERT_MANIFEST_DIR, f"{backend}-{file_hash}.jsonl")
+        self._lock = threading.Lock()
+        self.batch_size = None
+        self.done = {}      # batch index -> vectors stored
+        self.complete = False
+        self.total = None
+        self._read()
+
+        if batch_size is not None and self.batch_size != batch_size:
+            # Missing, or written with different batching: batches would not line up
+            self._reset(batch_size)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from an interrupted write
+                    if "batch_size" in entry:
+                        self.batch_size = entry["batch_size"]
+                    elif "batch" in entry:
+                        self.done[entry["batch"]] = entry["count"]
+                    elif entry.get("complete"):
+                        self.complete = True
+                        self.total = entry.get("total")
+        except FileNotFoundError:
+            pass
+
+    def _append(self, entry: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _reset(self, batch_size: int):
+        os.makedirs(UPSERT_MANIFEST_DIR, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"file_hash": self.file_hash, "batch_size": batch_size}) + "\n")
+        self.batch_size = batch_size
+        self.done = {}
+        self.complete = False
+        self.total = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def discard(self):
+        # The namespace no longer holds this upload (e.g. a newer version replaced it)
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.batch_size = None
+            self.done = {}
+            self.complete = False
+            self.total = None
+
+    def is_done(self, batch_index: int) -> bool:
+        return batch_index in self.done
+
+    def mark_done(self, batch_index: int, count: int):
+        with self._lock:
+            self.done[batch_index] = count
+            self._append({"batch": batch_index, "count": count})
+
+    def mark_complete(self, total: int):
+        with self._lock:
+            self.complete = True
+            self.total = total
+            self._append({"complete": True, "total": total})
+
+
+def record_existing(file_hash: str, backend: str):
+    # For documents indexed before manifests existed: remember that the
+    # backend already has them so later checks stay local
+    manifest = UpsertManifest(file_hash, backend, batch_size=0)
+    manifest.mark_complete(None)
+    return manifest
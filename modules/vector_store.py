@@ -0,0 +1,277 @@
+# modules/vector_store.py
+
+import os
+import json
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+# === Config ===
+# VECTOR_STORE picks the backend: "pinecone" (remote) or "local" (FAISS on disk)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "indices")
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "fingenai-index")
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+PINECONE_DELETE_BATCH = 1000  # Most ids Pinecone accepts per delete request
+
+
+# === Interface ===
+# Every backend speaks Pinecone's vector format on the way in
+# ({"id", "values", "metadata"}) and returns plain match dicts
+# ({"id", "score", "metadata"}) on the way out, one namespace per file_hash.
+class VectorStore:
+    name = "base"
+    # False for backends that buffer upserts until flush(); callers only
+    # count a batch as stored once it has been flushed
+    durable = True
+
+    def upsert(self, vectors: List[dict], namespace: str):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int = 5, namespace: Optional[str] = None) -> List[dict]:
+        raise NotImplementedError
+
+    def exists(self, namespace: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str], namespace: str):
+        raise NotImplementedError
+
+    def flush(self, namespace: str):
+        pass
+
+
+# === Pinecone backend ===
+class PineconeVectorStore(VectorStore):
+    name = "pinecone"
+
+    def __init__(self, index_name: str = PINECONE_INDEX_NAME, dimension: int = EMBEDDING_DIM):
+        from pinecone import Pinecone, ServerlessSpec
+
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        if index_name not in pc.list_indexes().names():
+            pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+        self.index = pc.Index(index_name)
+
+    def upsert(self, vectors, namespace):
+        self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k=5, namespace=None):
+        query_args = {
+            "vector": [float(x) for x in vector],
+            "top_k": top_k,
+            "include_metadata": True
+        }
+        if namespace:
+            query_args["namespace"] = namespace
+
+        response = self.index.query(**query_args)
+        if not response or not response.matches:
+            return []
+        return [
+            {"id": match.id, "score": match.score, "metadata": match.metadata or {}}
+            for match in response.matches
+        ]
+
+    def exists(self, namespace):
+        stats = self.index.describe_index_stats()
+        return namespace in stats.namespaces and stats.namespaces[namespace]["vector_count"] > 0
+
+    def delete(self, ids, namespace):
+        # Raises on the first failed request; deleting the same ids again is harmless
+        ids = list(ids)
+        for start in range(0, len(ids), PINECONE_DELETE_BATCH):
+            self.index.delete(ids=ids[start:start + PINECONE_DELETE_BATCH], namespace=namespace)
+
+
+# === Local FAISS backend ===
+# One flat inner-product index per namespace ({namespace}.index), opened
+# memory-mapped for queries, plus a compact JSON sidecar
+# ({namespace}.meta.json) holding ids and metadata in index order.
+# Vectors are L2-normalised so scores are cosine, same as the Pinecone index.
+#
+# Writes are buffered: the first upsert to a namespace loads it once and
+# takes an exclusive lock file ({namespace}.lock) so other processes
+# (batch_qa, bulk_ingest, the app) can't interleave writes; later upserts
+# only add to the in-memory buffer, and flush() writes the index once and
+# releases the lock. Queries keep reading the last flushed files.
+def _lock_file(path):
+    f = open(path, "a+")
+    try:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_EX)
+    except ImportError:
+        pass  # no cross-process locking on this platform
+    return f
+
+
+def _unlock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_UN)
+    except ImportError:
+        pass
+    f.close()
+
+
+class LocalVectorStore(VectorStore):
+    name = "local"
+    durable = False
+
+    def __init__(self, index_dir: str = LOCAL_INDEX_DIR, dimension: int = EMBEDDING_DIM):
+        self.index_dir = index_dir
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._open = {}  # namespace -> (stat key, index, ids, metadata)
+        self._namespace_locks = {}
+        self._pending = {}  # namespace -> (lock file, {id: (vector, metadata)})
+
+    def _paths(self, namespace):
+        return (
+            os.path.join(self.index_dir, f"{namespace}.index"),
+            os.path.join(self.index_dir, f"{namespace}.meta.json"),
+        )
+
+    def _namespace_lock(self, namespace):
+        with self._lock:
+            return self._namespace_locks.setdefault(namespace, threading.RLock())
+
+    def _load(self, namespace):
+        import faiss
+
+        index_path, meta_path = self._paths(namespace)
+        if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+            return None
+
+        stat = os.stat(index_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._open.get(namespace)
+        if cached and cached[0] == key:
+            return cached
+
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        entry = (key, index, meta["ids"], meta["metadata"])
+        self._open[namespace] = entry
+        return entry
+
+    def _buffer(self, namespace):
+        # Called holding the namespace lock. Loads the flushed contents after
+        # taking the lock file, so writes from another process aren't lost.
+        pending = self._pending.get(namespace)
+        if pending is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            lock = _lock_file(os.path.join(self.index_dir, f"{namespace}.lock"))
+            entry = self._load(namespace)
+            rows = {}
+            if entry is not None and entry[1].ntotal:
+                _, index, ids, metadata = entry
+                vectors = index.reconstruct_n(0, index.ntotal)
+                rows = {vid: (vector, meta) for vid, vector, meta in zip(ids, vectors, metadata)}
+            pending = self._pending[namespace] = (lock, rows)
+        return pending[1]
+
+    def _write(self, namespace, vectors, ids, metadata):
+        import faiss
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        index_path, meta_path = self._paths(namespace)
+
+        index = faiss.IndexFlatIP(self.dimension)
+        if len(ids):
+            index.add(vectors)
+
+        # Write to temp files and swap in so readers never see a half-written index
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadata": metadata}, f, ensure_ascii=False, separators=(",", ":"))
+        faiss.write_index(index, index_path + ".tmp")
+        os.replace(meta_path + ".tmp", meta_path)
+        os.replace(index_path + ".tmp", index_path)
+        self._open.pop(namespace, None)
+
+    def _normalize(self, values):
+        import numpy as np
+        import faiss
+
+        matrix = np.ascontiguousarray(np.asarray(values, dtype="float32").reshape(-1, self.dimension))
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def upsert(self, vectors, namespace):
+        # O(batch): replaces or appends rows in the buffer; nothing is written
+        if not vectors:
+            return
+        new_values = self._normalize([v["values"] for v in vectors])
+        with self._namespace_lock(namespace):
+            rows = self._buffer(namespace)
+            for vector, values in zip(vectors, new_values):
+                rows[vector["id"]] = (values, vector.get("metadata", {}))
+
+    def flush(self, namespace):
+        import numpy as np
+
+        with self._namespace_lock(namespace):
+            pending = self._pending.pop(namespace, None)
+            if pending is None:
+                return
+            lock, rows = pending
+            try:
+                ids = list(rows)
+                vectors = (np.stack([rows[vid][0] for vid in ids]) if ids
+                           else np.zeros((0, self.dimension), dtype="float32"))
+                self._write(namespace, vectors, ids, [rows[vid][1] for vid in ids])
+            finally:
+                _unlock_file(lock)
+
+    def query(self, vector, top_k=5, namespace=None):
+        entry = self._load(namespace)
+        if entry is None:
+            return []
+        _, index, ids, metadata = entry
+        if index.ntotal == 0:
+            return []
+
+        scores, rows = index.search(self._normalize(vector), min(top_k, index.ntotal))
+        return [
+            {"id": ids[row], "score": float(score), "metadata": metadata[row]}
+            for score, row in zip(scores[0], rows[0])
+            if row >= 0
+        ]
+
+    def exists(self, namespace):
+        entry = self._load(namespace)
+        return entry is not None and entry[1].ntotal > 0
+
+    def delete(self, ids, namespace):
+        drop = set(ids)
+        if not drop:
+            return
+        with self._namespace_lock(namespace):
+            rows = self._buffer(namespace)
+            for vid in drop:
+                rows.pop(vid, None)
+            self.flush(namespace)
+
+    def open_index(self, namespace):
+        # Raw (faiss index, metadata list) pair for callers that search FAISS directly
+        entry = self._load(namespace)
+        if entry is None:
+            return None, []
+        return entry[1], entry[3]
+
+
+# === Backend selection ===
+@lru_cache(maxsize=None)
+def get_vector_store() -> VectorStore:
+    if VECTOR_STORE == "local":
+        return LocalVectorStore()
+    if VECTOR_STORE == "pinecone":
+        return PineconeVectorStore()
+    raise ValueError(f"Unknown VECTOR_STORE backend: {VECTOR_STORE!r} (expected 'pinecone' or 'local')")